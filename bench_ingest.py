@@ -0,0 +1,63 @@
+# bench_ingest.py
+# Times crawl_and_index in its default and bulk modes on the same synthetic tree.
+#
+#   python bench_ingest.py [file_count] [workers]
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from db import init_db
+from crawler import crawl_and_index
+
+FILES_PER_DIR = 100
+DIRS_PER_LEVEL = 100
+
+
+def build_tree(root, file_count):
+    made = 0
+    top = 0
+    while made < file_count:
+        for sub in range(DIRS_PER_LEVEL):
+            if made >= file_count:
+                break
+            directory = os.path.join(root, f"dir_{top:04d}", f"sub_{sub:03d}")
+            os.makedirs(directory)
+            for i in range(min(FILES_PER_DIR, file_count - made)):
+                ext = (".txt", ".pdf", ".jpg", ".py")[i % 4]
+                open(os.path.join(directory, f"file_{i:03d}{ext}"), "w").close()
+            made += FILES_PER_DIR
+        top += 1
+
+
+def run(label, tree, db_path, workers, bulk):
+    init_db(db_path)
+    start = time.time()
+    crawl_and_index(tree, db_path, workers=workers, bulk=bulk, snapshot=False)
+    return label, time.time() - start
+
+
+if __name__ == "__main__":
+    file_count = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+
+    work_dir = tempfile.mkdtemp(prefix="deepan_bench_")
+    tree = os.path.join(work_dir, "tree")
+    try:
+        print(f"Building synthetic tree with {file_count} files in {tree}...")
+        start = time.time()
+        build_tree(tree, file_count)
+        print(f"Tree built in {time.time() - start:.2f}s")
+
+        results = [
+            run("default", tree, os.path.join(work_dir, "default.db"), workers, bulk=False),
+            run("bulk", tree, os.path.join(work_dir, "bulk.db"), workers, bulk=True),
+        ]
+
+        print()
+        print(f"{'mode':<10}{'seconds':>10}{'files/s':>12}")
+        for label, elapsed in results:
+            print(f"{label:<10}{elapsed:>10.2f}{file_count / elapsed:>12.0f}")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
@@ -0,0 +1,81 @@
+# bench_resolver.py
+# Times fuzzy name lookups over synthetic names: difflib over every name,
+# the NumPy full scan (name_matrix.py) and the edit/trigram indexes.
+#
+#   python bench_resolver.py [name_count] [query_count]
+import random
+import string
+import sys
+import time
+from difflib import get_close_matches
+
+from name_index import EditIndex, NameTable, TrigramIndex
+from name_matrix import NameMatrix
+
+CUTOFF = 0.6
+WORDS = ["report", "budget", "final", "notes", "invoice", "photo", "img", "scan",
+         "draft", "backup", "project", "summary", "music", "video", "setup", "readme"]
+EXTENSIONS = [".txt", ".pdf", ".jpg", ".py", ".docx", ".mp3", ""]
+
+
+def make_names(count, rng):
+    names = set()
+    while len(names) < count:
+        parts = rng.sample(WORDS, rng.randint(1, 3))
+        if rng.random() < 0.7:
+            parts.append(str(rng.randint(0, 9999)))
+        names.add("_".join(parts) + rng.choice(EXTENSIONS))
+    return sorted(names)
+
+
+def make_queries(names, count, rng):
+    """Indexed names with a letter or two misheard, plus some short ones."""
+    queries = []
+    for _ in range(count):
+        query = list(rng.choice(names))
+        for _ in range(rng.randint(0, 2)):
+            query[rng.randrange(len(query))] = rng.choice(string.ascii_lowercase)
+        queries.append("".join(query))
+        if len(queries) % 4 == 0:
+            queries[-1] = queries[-1][:3]
+    return queries
+
+
+def timed(label, queries, lookup):
+    start = time.time()
+    found = sum(1 for query in queries if lookup(query))
+    elapsed = time.time() - start
+    print(f"{label:<24} {elapsed:8.2f}s  {len(queries) / elapsed:10.1f} queries/s  {found} found")
+
+
+def main():
+    name_count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    query_count = int(sys.argv[2]) if len(sys.argv) > 2 else 50
+    rng = random.Random(7)
+    names = make_names(name_count, rng)
+    queries = make_queries(names, query_count, rng)
+
+    start = time.time()
+    table = NameTable(names)
+    trigrams = TrigramIndex(table)
+    print(f"Trigram index built in {time.time() - start:.2f}s, {trigrams.nbytes() / 2**20:.1f} MB")
+    start = time.time()
+    edits = EditIndex(table)
+    elapsed = time.time() - start
+    saved = edits.to_arrays()
+    size = sum(len(part) * getattr(part, "itemsize", 1) for part in saved.values())
+    print(f"Edit index built in {elapsed:.2f}s, {len(edits.deletes)} keys, "
+          f"{len(saved['ids'])} ids, {size / 2**20:.1f} MB saved")
+    start = time.time()
+    matrix = NameMatrix(table)
+    print(f"Name matrix built in {time.time() - start:.2f}s, {matrix.nbytes() / 2**20:.1f} MB")
+    print(f"{name_count} names, {query_count} queries")
+
+    timed("difflib full scan", queries, lambda q: get_close_matches(q, names, n=1, cutoff=CUTOFF))
+    timed("numpy full scan", queries, lambda q: matrix.best_match(q, CUTOFF)[1])
+    timed("edit + trigram index", queries,
+          lambda q: edits.best_match(q)[1] or trigrams.best_match(q, CUTOFF)[1])
+
+
+if __name__ == "__main__":
+    main()
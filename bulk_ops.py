@@ -0,0 +1,160 @@
+# bulk_ops.py
+# Set-based actions: "delete all .tmp files in downloads", "move all
+# screenshots to pictures". The files acted on are one metadata query
+# (file_query.py: an extension filter below the scope folder, served by the
+# extension indexes), counted for a preview before anything changes, then
+# deleted or moved on a thread pool. The index and the resolver are updated
+# for the whole batch at once afterwards.
+import os
+import re
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from file_query import human_size, parse_query, run_query
+
+BULK_WORKERS = 8     # threads doing the file I/O
+PREVIEW_NAMES = 5    # example names shown with the preview and failures
+
+BULK_VERBS = {"delete": "delete", "remove": "delete", "erase": "delete", "move": "move"}
+_BULK = re.compile(r"^(delete|remove|erase|move)\s+(?:all|every)\s+(?:(?:the|my|of the|of my)\s+)?(.+)$")
+_DESTINATION = re.compile(r"\s+(?:to|into)\s+(?:the |my )?(.+?)(?:\s+(?:folder|directory))?$")
+
+
+class BulkRequest:
+    """One set-based action; see parse_bulk."""
+
+    def __init__(self, action, query, scope=None, destination=None):
+        self.action = action            # "delete" or "move"
+        self.query = query              # FileQuery selecting the files
+        self.scope = scope              # folder name the files must be below, or None
+        self.destination = destination  # folder name to move into
+
+
+def parse_bulk(text):
+    """BulkRequest for "delete all .tmp files in downloads" and the like, else None.
+
+    The phrase has to say "all" and name a file type, so a plain "delete
+    report" stays a single-file action.
+    """
+    text = " ".join((text or "").lower().replace("?", "").split())
+    match = _BULK.match(text)
+    if not match:
+        return None
+    action, rest = BULK_VERBS[match.group(1)], match.group(2)
+
+    destination = None
+    if action == "move":
+        match = _DESTINATION.search(rest)
+        if not match:
+            return None
+        destination, rest = match.group(1), rest[:match.start()]
+
+    query, scope = parse_query("all " + rest)
+    if query is None or not query.extensions:
+        return None
+    return BulkRequest(action, query, scope, destination)
+
+
+def bulk_targets(request, db_path="files.db", scope=None, destination=None):
+    """[(path, size, modified)] of the files `request` acts on, below the directory `scope` if given.
+
+    Files already in `destination` are left out of a move.
+    """
+    rows = []
+    for page in run_query(request.query, db_path, [scope] if scope else None):
+        rows.extend(row for row in page if os.path.dirname(row[0]) != destination)
+    return rows
+
+
+def _examples(paths):
+    names = [os.path.basename(path) for path in paths[:PREVIEW_NAMES]]
+    more = len(paths) - len(names)
+    return ", ".join(names) + (f" and {more} more" if more > 0 else "")
+
+
+def preview(request, targets, scope=None, destination=None):
+    """What `request` is about to do, as one line: count, total size, a few names."""
+    total = sum(size for _, size, _ in targets)
+    where = f" in {scope}" if scope else ""
+    into = f" to {destination}" if destination else ""
+    return (f"{request.action.capitalize()} {len(targets)} {request.query.label} "
+            f"({human_size(total)}){where}{into}: {_examples([path for path, _, _ in targets])}")
+
+
+def _delete_one(path):
+    try:
+        os.remove(path)
+    except OSError as e:
+        return path, None, e.strerror or str(e)
+    return path, None, None
+
+
+def _move_one(destination, path):
+    dest = os.path.join(destination, os.path.basename(path))
+    if os.path.exists(dest):
+        return path, dest, "already exists in the destination"
+    try:
+        shutil.move(path, dest)
+    except OSError as e:
+        return path, dest, e.strerror or str(e)
+    return path, dest, None
+
+
+def _distinct_names(paths):
+    """Split `paths` into ones with distinct file names and (path, reason) for the later duplicates.
+
+    Moved into one folder, two files with the same name would race for the
+    same destination; the first keeps it and the others fail up front.
+    """
+    seen, distinct, duplicates = set(), [], []
+    for path in paths:
+        name = os.path.normcase(os.path.basename(path))
+        if name in seen:
+            duplicates.append((path, "another file with this name is moved too"))
+        else:
+            seen.add(name)
+            distinct.append(path)
+    return distinct, duplicates
+
+
+def run_bulk(request, targets, resolver, destination=None, workers=BULK_WORKERS):
+    """Carry out `request` on `targets` (rows from bulk_targets).
+
+    Returns (done, failed): the rows that were deleted or moved, and
+    (path, reason) for the rest. The index is updated once for the batch.
+    """
+    work = partial(_move_one, destination) if request.action == "move" else _delete_one
+
+    sizes = {path: (size, modified) for path, size, modified in targets}
+    paths, failed = list(sizes), []
+    if request.action == "move":
+        paths, failed = _distinct_names(paths)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        outcomes = list(pool.map(work, paths))
+
+    done = [(path, dest) for path, dest, error in outcomes if error is None]
+    failed += [(path, error) for path, _, error in outcomes if error is not None]
+    try:
+        if request.action == "move":
+            resolver.moved_all(done)
+        else:
+            resolver.forget_all([path for path, _ in done])
+    except Exception as e:
+        # The files have changed either way; the watcher catches the index up.
+        print(f"[BULK WARNING] Could not update the index for {len(done)} path(s): {e}")
+    return [(path,) + sizes[path] for path, _ in done], failed
+
+
+def summarize(request, done, failed, destination=None):
+    """One line for the whole batch: how many succeeded, how much, what failed and why."""
+    verb = "Moved" if request.action == "move" else "Deleted"
+    into = f" to {destination}" if destination else ""
+    total = sum(size for _, size, _ in done)
+    line = (f"{verb} {len(done)} of {len(done) + len(failed)} {request.query.label}"
+            f"{into} ({human_size(total)})")
+    if failed:
+        reasons = "; ".join(f"{os.path.basename(path)}: {error}" for path, error in failed[:PREVIEW_NAMES])
+        more = len(failed) - PREVIEW_NAMES
+        line += f"; {len(failed)} failed ({reasons}{f'; and {more} more' if more > 0 else ''})"
+    return line
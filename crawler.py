@@ -1,94 +1,782 @@
 # crawler.py
 import os
-import sqlite3
+import stat
 import time
+import multiprocessing as mp
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from db import (
+    connect,
+    init_db,
+    shard_path,
+    register_shard,
+    insert_files,
+    insert_directories,
+    delete_files,
+    delete_subtree,
+    delete_path,
+    move_path,
+    dir_id,
+    database_for,
+    databases_for,
+    list_children,
+    set_directory_modified,
+    set_directories_modified,
+    subtree_directories,
+    record_root,
+    begin_bulk_load,
+    finish_bulk_load,
+    STAGING_SUFFIX,
+    start_crawl_run,
+    update_crawl_run,
+    update_refresh_run,
+    mark_crawl_run,
+    finish_crawl_run,
+    find_unfinished_run,
+    load_frontier,
+    add_frontier,
+    remove_frontier,
+    rebuild_rollups,
+    rollups_current,
+    invalidate_rollups,
+    directory_totals,
+    directory_page,
+    directory_modified,
+)
+from snapshot import write_snapshot
 
 BATCH_SIZE = 1000
+BULK_BATCH_SIZE = 100_000  # rows per transaction when bulk loading
+SUBTREE_BUDGET = 5000      # entries one worker scans before handing the rest back
+TASKS_PER_WORKER = 4       # subtrees kept in flight per worker
+PROGRESS_INTERVAL = 5.0    # seconds between throughput reports
+SUBTREE_REPORT = 10        # slowest top-level subtrees listed after a crawl
+LISTING_PAGE = 50          # entries per page of list_directory
+
+# Indexed before anything else so they resolve within seconds of a fresh
+# install; mirrors the SHELL_FOLDERS targets used by the executors.
+PRIORITY_FOLDERS = ["Downloads", "Documents", "Desktop", "Pictures", "Music", "Videos"]
+PRIORITY_DEPTH = 4         # levels below each priority folder listed up front
+HOME_DEPTH = 1             # the rest of the home folder is left to the full crawl
+
+
+def _scan_dir(path):
+    """List one directory with os.scandir.
+
+    Returns (dir_rows, file_rows, subdirs, errors, mtime); `subdirs` are the
+    directories to descend into, `errors` counts failed stats by exception
+    type and `mtime` is `path`'s own, taken before listing. Subdirectory
+    rows carry no mtime: it is only stored once they have been listed
+    themselves, so a directory that was found but never listed reads as
+    stale. Raises OSError if `path` can't be listed.
+    """
+    dir_rows = []
+    file_rows = []
+    subdirs = []
+    errors = Counter()
+
+    # Stat before listing so a change racing the scandir shows up next time.
+    mtime = os.stat(path).st_mtime
+    with os.scandir(path) as it:
+        entries = list(it)
+
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+            st = entry.stat()
+        except OSError as e:
+            errors[type(e).__name__] += 1
+            continue
+
+        if is_dir:
+            dir_rows.append((path, entry.name, None))
+            # Same as os.walk(followlinks=False): list the link, don't descend.
+            if not entry.is_symlink():
+                subdirs.append(entry.path)
+        else:
+            ext = os.path.splitext(entry.name)[1]
+            file_rows.append((path, entry.name, ext.lower(), st.st_size, st.st_mtime))
+
+    return dir_rows, file_rows, subdirs, errors, mtime
+
+
+def _scan_subtree(root, budget=SUBTREE_BUDGET):
+    """Scan `root` depth-first until `budget` entries are seen.
+
+    Returns (dir_rows, file_rows, pending, errors, timings, listed) where
+    `pending` holds the directories that were discovered but not listed
+    yet, so the caller can hand them to another worker, `timings` maps
+    `root` and each of its subfolders to [seconds, entries] spent listing
+    them and `listed` is (path, mtime) for every directory listed.
+    """
+    dir_rows = []
+    file_rows = []
+    listed = []
+    errors = Counter()
+    timings = {}
+    scanned = 0
+    stack = [(root, root)]
+
+    while stack and scanned < budget:
+        current, key = stack.pop()
+        start = time.perf_counter()
+        try:
+            dirs, files, subdirs, dir_errors, mtime = _scan_dir(current)
+        except OSError as e:
+            errors[type(e).__name__] += 1
+            continue
+
+        listed.append((current, mtime))
+        dir_rows.extend(dirs)
+        file_rows.extend(files)
+        stack.extend((subdir, subdir if current == root else key) for subdir in subdirs)
+        errors.update(dir_errors)
+        scanned += len(dirs) + len(files)
+
+        timing = timings.setdefault(key, [0.0, 0])
+        timing[0] += time.perf_counter() - start
+        timing[1] += len(dirs) + len(files)
+
+    return dir_rows, file_rows, [path for path, _ in stack], errors, timings, listed
+
+
+def _serial_scan(pending):
+    pending = list(pending)
+    while pending:
+        start = pending.pop()
+        result = _scan_subtree(start)
+        pending.extend(result[2])
+        yield start, result, len(pending), 0
+
+
+def _parallel_scan(pending, workers):
+    ctx = mp.get_context("spawn")
+    pending = list(pending)
+    in_flight = {}
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as pool:
+        while pending or in_flight:
+            while pending and len(in_flight) < workers * TASKS_PER_WORKER:
+                start = pending.pop()
+                in_flight[pool.submit(_scan_subtree, start)] = start
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                start = in_flight.pop(future)
+                result = future.result()
+                pending.extend(result[2])
+                yield start, result, len(pending), len(in_flight)
+
+
+def _subtree_key(root, path):
+    """Top-level folder of `root` that `path` belongs to, for the time breakdown."""
+    rel = os.path.relpath(path, root)
+    if rel == os.curdir:
+        return root
+    return os.path.join(root, rel.split(os.sep, 1)[0])
+
+
+def crawl_and_index(root_path, db_path="files.db", workers=None, bulk=False, progress=None,
+                    snapshot=True):
+    """Index everything under `root_path` into `db_path`.
+
+    Subtrees are scanned by a pool of `workers` processes (defaults to the
+    CPU count) while this process is the only SQLite writer. `workers=1`
+    scans in-process.
+
+    Progress is checkpointed: every commit also records which directories
+    still have to be scanned (crawl_frontier), so a crawl that was
+    interrupted picks up where its last commit left off.
+
+    `bulk=True` is meant for first builds: rows go into unindexed staging
+    tables in large WAL transactions with syncing off, and the indexed
+    tables are built and swapped in once at the end.
+
+    `progress`, if given, is called with a dict every PROGRESS_INTERVAL
+    seconds (stage "progress") and once at the end (stage "done", with the
+    per-subtree breakdown); mic/indexer.py turns these into CRAWL_PROGRESS
+    events for the GUI.
+
+    With `snapshot` (the default) the resolver snapshot is rewritten at the
+    end, so the next executor start doesn't have to rebuild its lookups.
+    """
+    workers = workers or os.cpu_count() or 1
+    kind = "bulk" if bulk else "full"
+    suffix = STAGING_SUFFIX if bulk else ""
+    batch_size = BULK_BATCH_SIZE if bulk else BATCH_SIZE
+
+    conn = connect(db_path)
+    cursor = conn.cursor()
+
+    run = find_unfinished_run(cursor, root_path, kind)
+    # Batches go in without per-directory totals; they are rebuilt at the end.
+    invalidate_rollups(cursor)
+    conn.commit()
+    if bulk:
+        begin_bulk_load(conn, root_path, resume=run is not None)
+
+    if run is not None:
+        run_id, total_files, total_dirs, total_errors = run
+        pending = load_frontier(cursor, run_id)
+        mark_crawl_run(cursor, run_id, "running")
+        print(f"[CRAWLER] Resuming run #{run_id} of {root_path}: "
+              f"{len(pending)} directories left, {total_files} files already indexed")
+    else:
+        run_id = start_crawl_run(cursor, root_path, kind)
+        total_files = total_dirs = total_errors = 0
+        pending = [root_path]
+        add_frontier(cursor, run_id, pending)
+    conn.commit()
+
+    file_batch = []
+    dir_batch = []
+    listed_batch = []
+    frontier_added = []
+    frontier_done = []
+    start_time = time.time()
+    last_report = start_time
+    session_files = 0
+    session_entries = 0
+    error_types = Counter()
+    commits = 0
+    commit_seconds = 0.0
+    subtrees = {}              # top-level folder -> [scan seconds, entries]
+
+    def flush():
+        nonlocal total_files, total_dirs, session_files, commits, commit_seconds
+        commit_start = time.perf_counter()
+        insert_directories(cursor, dir_batch, suffix)
+        insert_files(cursor, file_batch, suffix)
+        set_directories_modified(cursor, listed_batch, suffix)
+        # Add before removing: a subtree found and finished within the same
+        # batch has to cancel out.
+        add_frontier(cursor, run_id, frontier_added)
+        remove_frontier(cursor, run_id, frontier_done)
+        total_dirs += len(dir_batch)
+        total_files += len(file_batch)
+        session_files += len(file_batch)
+        update_crawl_run(cursor, run_id, total_files, total_dirs, total_errors)
+        conn.commit()
+        commits += 1
+        commit_seconds += time.perf_counter() - commit_start
+        dir_batch.clear()
+        file_batch.clear()
+        listed_batch.clear()
+        frontier_added.clear()
+        frontier_done.clear()
+
+    def stats(stage, pending_count, in_flight):
+        elapsed = max(time.time() - start_time, 1e-9)
+        return {
+            "stage": stage,
+            "root": root_path,
+            "run_id": run_id,
+            "files": total_files,
+            "directories": total_dirs,
+            "entries_per_sec": session_entries / elapsed,
+            "pending": pending_count,
+            "in_flight": in_flight,
+            "errors": dict(error_types),
+            "commits": commits,
+            "commit_ms": 1000 * commit_seconds / commits if commits else 0.0,
+            "elapsed": elapsed,
+        }
+
+    if workers > 1:
+        results = _parallel_scan(pending, workers)
+    else:
+        results = _serial_scan(pending)
+
+    try:
+        for start, (dir_rows, file_rows, rest, errors, timings, listed), pending_count, in_flight in results:
+            dir_batch.extend(dir_rows)
+            file_batch.extend(file_rows)
+            listed_batch.extend(listed)
+            frontier_added.extend(rest)
+            frontier_done.append(start)
+            total_errors += sum(errors.values())
+            error_types.update(errors)
+
+            session_entries += len(dir_rows) + len(file_rows)
+            for path, (seconds, entries) in timings.items():
+                subtree = subtrees.setdefault(_subtree_key(root_path, path), [0.0, 0])
+                subtree[0] += seconds
+                subtree[1] += entries
+
+            if len(file_batch) + len(dir_batch) >= batch_size:
+                flush()
+
+            now = time.time()
+            if now - last_report >= PROGRESS_INTERVAL:
+                last_report = now
+                report = stats("progress", pending_count, in_flight)
+                print(f"[CRAWLER] {total_files} files, {total_dirs} directories "
+                      f"({report['entries_per_sec']:.0f} entries/s, {in_flight} subtrees in flight, "
+                      f"{pending_count} pending, {total_errors} errors, "
+                      f"{report['commit_ms']:.1f} ms/commit)")
+                if progress is not None:
+                    progress(report)
+    except KeyboardInterrupt:
+        flush()
+        mark_crawl_run(cursor, run_id, "interrupted")
+        conn.commit()
+        conn.close()
+        print(f"[CRAWLER] Interrupted; run #{run_id} checkpointed at {total_files} files. "
+              f"Run again to resume.")
+        raise
+
+    flush()
+    swap_seconds = 0.0
+    if bulk:
+        swap_start = time.time()
+        finish_bulk_load(conn, root_path)
+        swap_seconds = time.time() - swap_start
+        print(f"[CRAWLER] Built indexes and swapped tables in {swap_seconds:.2f}s")
+    finish_crawl_run(cursor, run_id, "completed")
+    record_root(cursor, root_path)
+    rollup_start = time.time()
+    rebuild_rollups(cursor)
+    rollup_seconds = time.time() - rollup_start
+    conn.commit()
+    conn.close()
+
+    report = stats("done", 0, 0)
+    elapsed = report["elapsed"]
+    print(f"Indexed {total_files} files and {total_dirs} directories in {elapsed:.2f}s "
+          f"({session_files / elapsed:.0f} files/s, {workers} workers, {total_errors} errors)")
+
+    # Scan time is summed across workers; DB time is this process alone, so
+    # comparing the two shows whether the crawl was disk/stat- or SQLite-bound.
+    scan_seconds = sum(seconds for seconds, _ in subtrees.values())
+    db_seconds = commit_seconds + swap_seconds
+    print(f"[CRAWLER] Scan {scan_seconds:.2f}s across workers, SQLite {db_seconds:.2f}s "
+          f"({commits} commits, {report['commit_ms']:.1f} ms avg), size rollups {rollup_seconds:.2f}s")
+    if error_types:
+        print("[CRAWLER] Errors: " + ", ".join(f"{name} {count}" for name, count in error_types.most_common()))
+
+    slowest = sorted(subtrees.items(), key=lambda item: item[1][0], reverse=True)[:SUBTREE_REPORT]
+    for path, (seconds, entries) in slowest:
+        print(f"[CRAWLER]   {seconds:8.2f}s {entries:>10} entries  {path}")
+
+    # The executor maps this in on start instead of scanning the tables.
+    if snapshot:
+        try:
+            write_snapshot(db_path)
+        except OSError as e:
+            print(f"[CRAWLER WARNING] Snapshot not written for {db_path}: {e}")
+
+    if progress is not None:
+        report["scan_seconds"] = scan_seconds
+        report["db_seconds"] = db_seconds
+        report["subtrees"] = [(path, seconds, entries) for path, (seconds, entries) in slowest]
+        progress(report)
+
+
+def _crawl_shard(root_path, shard, workers, bulk):
+    crawl_and_index(root_path, shard, workers=workers, bulk=bulk)
+
+
+def register_shards(roots, db_path="files.db"):
+    """Create a shard DB for every root and register it in `db_path`'s catalog.
+
+    From then on writes below a root (database_for) and lookups go to its
+    shard. Returns [(root, shard path)].
+    """
+    shards = [(root, shard_path(root, db_path)) for root in roots]
+    for _, shard in shards:
+        os.makedirs(os.path.dirname(shard), exist_ok=True)
+        init_db(shard)
+
+    conn = connect(db_path)
+    for root, shard in shards:
+        register_shard(conn.cursor(), root, shard)
+    conn.commit()
+    conn.close()
+    return shards
+
+
+def crawl_shards(roots, db_path="files.db", bulk=False):
+    """Crawl every root into its own shard DB, one process per root.
+
+    The shards are registered in `db_path`'s catalog up front, so lookups
+    federate across them while they are being built. A single shard can be
+    rebuilt later with crawl_and_index(root, shard_path(root)) without
+    locking the others.
+    """
+    shards = register_shards(roots, db_path)
+
+    ctx = mp.get_context("spawn")
+    workers = max(1, (os.cpu_count() or 1) // len(shards))
+    processes = [
+        ctx.Process(target=_crawl_shard, args=(root, shard, workers, bulk), name=f"Crawl {root}")
+        for root, shard in shards
+    ]
+
+    start_time = time.time()
+    for process in processes:
+        process.start()
+    for process, (root, shard) in zip(processes, shards):
+        process.join()
+        status = "ok" if process.exitcode == 0 else f"failed (exit code {process.exitcode})"
+        print(f"[CRAWLER] Shard {root} -> {shard}: {status}")
 
+    print(f"Crawled {len(shards)} shards in {time.time() - start_time:.2f}s")
 
-def crawl_and_index(root_path, db_path="files.db"):
-    conn = sqlite3.connect(db_path)
+
+def priority_roots():
+    """(path, depth budget) pairs for the folders indexed first."""
+    home = os.path.expanduser("~")
+    roots = [(home, HOME_DEPTH)]
+    for name in PRIORITY_FOLDERS:
+        path = os.path.join(home, name)
+        if os.path.isdir(path):
+            roots.append((path, PRIORITY_DEPTH))
+    return roots
+
+
+def crawl_priority(db_path="files.db", roots=None):
+    """Breadth-first pass over the high-value folders, committed level by level.
+
+    Nothing below a root's depth budget is listed here; the full
+    crawl_and_index that follows fills those in. Each folder goes into
+    the DB that owns it: the shard of a registered root above it
+    (register_shards runs first when sharding), else `db_path` itself.
+    """
+    roots = roots if roots is not None else priority_roots()
+    owners = databases_for([path for path, _ in roots], db_path)
+    groups = {}
+    for path, budget in roots:
+        groups.setdefault(owners[path], []).append((path, budget))
+    for target, group in groups.items():
+        _priority_pass(target, group)
+
+
+def _priority_pass(db_path, roots):
+    conn = connect(db_path)
     cursor = conn.cursor()
 
     file_batch = []
     dir_batch = []
+    listed_batch = []
     total_files = 0
     total_dirs = 0
     start_time = time.time()
 
-    for root, dirs, files in os.walk(root_path):
-        for d in dirs:
-            dir_path = os.path.join(root, d)
+    def flush():
+        nonlocal total_files, total_dirs
+        insert_directories(cursor, dir_batch)
+        insert_files(cursor, file_batch)
+        # Folders at the depth budget stay without an mtime until listed.
+        set_directories_modified(cursor, listed_batch)
+        conn.commit()
+        total_dirs += len(dir_batch)
+        total_files += len(file_batch)
+        dir_batch.clear()
+        file_batch.clear()
+        listed_batch.clear()
+
+    frontier = deque((path, 0, budget) for path, budget in roots)
+    listed = set()
+    depth = 0
+
+    while frontier:
+        path, path_depth, budget = frontier.popleft()
+        if path in listed:
+            continue
+        listed.add(path)
+
+        # Commit every finished level so the shallow, most useful rows land first.
+        if path_depth != depth:
+            flush()
+            depth = path_depth
+
+        try:
+            dir_rows, file_rows, subdirs, _, mtime = _scan_dir(path)
+        except OSError:
+            continue
+
+        dir_batch.extend(dir_rows)
+        file_batch.extend(file_rows)
+        listed_batch.append((path, mtime))
+        if path_depth < budget:
+            frontier.extend((subdir, path_depth + 1, budget) for subdir in subdirs)
+
+        if len(file_batch) + len(dir_batch) >= BATCH_SIZE:
+            flush()
+
+    flush()
+    conn.close()
+
+    print(f"Priority pass: {total_files} files and {total_dirs} directories "
+          f"from {len(roots)} folders into {db_path} in {time.time() - start_time:.2f}s")
+
+
+def refresh_directory(cursor, path):
+    """Re-list `path` and bring its direct children in the index up to date.
+
+    Returns (subdirs, new_subdirs, changed, deleted) where `subdirs` are the
+    directories found in `path` and `new_subdirs` the ones that weren't
+    indexed yet. Raises OSError if `path` can't be listed.
+    """
+    dir_rows, file_rows, subdirs, _, mtime = _scan_dir(path)
+
+    stored_files, stored_dirs = list_children(cursor, path)
+
+    changed_files = [row for row in file_rows if stored_files.get(row[1]) != (row[3], row[4])]
+    # New directories go in without an mtime (see _scan_dir), so an
+    # interrupted refresh can't mark them done.
+    new_dirs = [row for row in dir_rows if row[1] not in stored_dirs]
+    gone_files = stored_files.keys() - {row[1] for row in file_rows}
+    gone_dirs = stored_dirs.keys() - {row[1] for row in dir_rows}
+
+    delete_files(cursor, path, gone_files)
+    for gone in gone_dirs:
+        delete_subtree(cursor, os.path.join(path, gone))
+    insert_files(cursor, changed_files)
+    insert_directories(cursor, new_dirs)
+    set_directory_modified(cursor, path, mtime)
+
+    new_subdirs = [p for p in subdirs if os.path.basename(p) not in stored_dirs]
+    return subdirs, new_subdirs, len(changed_files) + len(new_dirs), len(gone_files) + len(gone_dirs)
+
+
+def refresh_index(root_path, db_path="files.db"):
+    """Bring an existing index of `root_path` up to date.
+
+    A directory is only re-listed when its mtime differs from the stored
+    `dir_nodes.modified`; unchanged directories are descended through
+    their stored children. A directory's mtime only moves when entries are
+    added, removed or renamed, so in-place edits to a file inside an
+    unchanged directory are picked up by the next full crawl, not here.
+    """
+    conn = connect(db_path)
+    cursor = conn.cursor()
+
+    run_id = start_crawl_run(cursor, root_path, "refresh")
+    conn.commit()
+
+    known = subtree_directories(cursor, root_path)
+
+    relisted = 0
+    skipped = 0
+    changed = 0
+    deleted = 0
+    errors = 0
+    pending_writes = 0
+    start_time = time.time()
+    stack = [root_path]
+
+    try:
+        while stack:
+            current = stack.pop()
             try:
-                stat = os.stat(dir_path)
-            except (PermissionError, FileNotFoundError):
+                st = os.lstat(current)
+            except OSError:
+                continue  # vanished; its parent's re-list removes the rows
+            if current != root_path and stat.S_ISLNK(st.st_mode):
                 continue
 
-            dir_batch.append((
-                dir_path,
-                d,
-                root,
-                stat.st_mtime
-            ))
-
-            if len(dir_batch) >= BATCH_SIZE:
-                cursor.executemany("""
-                INSERT OR REPLACE INTO directories
-                (path, name, parent, modified)
-                VALUES (?, ?, ?, ?)
-                """, dir_batch)
-                conn.commit()
-                total_dirs += len(dir_batch)
-                dir_batch.clear()
-
-        for file in files:
-            full_path = os.path.join(root, file)
+            if known.get(current) == st.st_mtime:
+                skipped += 1
+                stack.extend(os.path.join(current, name) for name in list_children(cursor, current)[1])
+                continue
 
             try:
-                stat = os.stat(full_path)
-            except (PermissionError, FileNotFoundError):
+                subdirs, _, dir_changed, dir_deleted = refresh_directory(cursor, current)
+            except OSError:
+                errors += 1
                 continue
 
-            name, ext = os.path.splitext(file)
-
-            file_batch.append((
-                full_path,
-                name,
-                ext.lower(),
-                stat.st_size,
-                stat.st_mtime
-            ))
-
-            if len(file_batch) >= BATCH_SIZE:
-                cursor.executemany("""
-                INSERT OR REPLACE INTO files
-                (path, name, extension, size, modified)
-                VALUES (?, ?, ?, ?, ?)
-                """, file_batch)
+            relisted += 1
+            changed += dir_changed
+            deleted += dir_deleted
+            stack.extend(subdirs)
+
+            pending_writes += dir_changed + dir_deleted + 1
+            if pending_writes >= BATCH_SIZE:
+                update_refresh_run(cursor, run_id, changed + deleted, relisted, errors)
                 conn.commit()
-                total_files += len(file_batch)
-                file_batch.clear()
-
-    # Insert remaining files
-    if file_batch:
-        cursor.executemany("""
-        INSERT OR REPLACE INTO files
-        (path, name, extension, size, modified)
-        VALUES (?, ?, ?, ?, ?)
-        """, file_batch)
+                pending_writes = 0
+    except KeyboardInterrupt:
+        # A directory's stored mtime is set last, so a half-done one is re-listed next time.
+        update_refresh_run(cursor, run_id, changed + deleted, relisted, errors)
+        mark_crawl_run(cursor, run_id, "interrupted")
         conn.commit()
-        total_files += len(file_batch)
-
-    # Insert remaining directories
-    if dir_batch:
-        cursor.executemany("""
-        INSERT OR REPLACE INTO directories
-        (path, name, parent, modified)
-        VALUES (?, ?, ?, ?)
-        """, dir_batch)
+        conn.close()
+        print(f"[CRAWLER] Refresh of {root_path} interrupted after {relisted} directories re-listed.")
+        raise
+    except Exception:
+        conn.rollback()
+        mark_crawl_run(cursor, run_id, "failed")
         conn.commit()
-        total_dirs += len(dir_batch)
+        conn.close()
+        raise
 
+    update_refresh_run(cursor, run_id, changed + deleted, relisted, errors)
+    finish_crawl_run(cursor, run_id, "completed")
+    record_root(cursor, root_path)
+    if not rollups_current(cursor):
+        rebuild_rollups(cursor)
+    conn.commit()
     conn.close()
 
-    print(f"Indexed {total_files} files and {total_dirs} directories in {time.time() - start_time:.2f}s")
+    print(f"Refreshed {root_path}: {relisted} directories re-listed, {skipped} unchanged, "
+          f"{changed} entries added/updated, {deleted} removed in {time.time() - start_time:.2f}s")
+
+
+def _is_indexed(cursor, path):
+    if dir_id(cursor, path) is not None:
+        return True
+    parent, name = os.path.split(path)
+    return name in list_children(cursor, parent)[0]
+
+
+def _index_path(cursor, path):
+    """Index `path` from scratch; a directory is listed with everything below it."""
+    st = os.stat(path)
+    parent, name = os.path.split(path)
+    if not stat.S_ISDIR(st.st_mode):
+        ext = os.path.splitext(name)[1].lower()
+        insert_files(cursor, [(parent, name, ext, st.st_size, st.st_mtime)])
+        return
+
+    insert_directories(cursor, [(parent, name, None)])
+    for _, (dir_rows, file_rows, _, _, _, listed), _, _ in _serial_scan([path]):
+        insert_directories(cursor, dir_rows)
+        insert_files(cursor, file_rows)
+        set_directories_modified(cursor, listed)
+
+
+def indexed_size(path, db_path="files.db"):
+    """(size in bytes, file count) below the directory `path` from the index, or None if not indexed."""
+    conn = connect(database_for(path, db_path), timeout=30)
+    try:
+        return directory_totals(conn.cursor(), path)
+    finally:
+        conn.close()
+
+
+def _disk_page(path, offset, limit):
+    with os.scandir(path) as it:
+        found = sorted(((not entry.is_dir(follow_symlinks=False), entry.name), entry) for entry in it)
+    entries = []
+    for (is_file, name), entry in found[offset:offset + limit]:
+        try:
+            st = entry.stat(follow_symlinks=False)
+        except OSError:
+            continue
+        entries.append((name, not is_file, st.st_size if is_file else None, st.st_mtime))
+    return entries, len(found)
+
+
+def list_directory(path, db_path="files.db", offset=0, limit=LISTING_PAGE):
+    """One page of `path`'s entries, directories first, each by name.
+
+    Returns (entries, total, source); entries are (name, is_dir, size,
+    modified). The page comes from the index when the directory's stored
+    mtime still matches the disk ("index"). When it differs, or there is
+    none because a crawl found the directory but never listed it, the
+    directory is re-listed into the index first ("refreshed"). Directories
+    that were never indexed are read straight from disk ("disk"). Raises
+    OSError if `path` can't be read.
+    """
+    mtime = os.stat(path).st_mtime
+    conn = connect(database_for(path, db_path), timeout=30)
+    try:
+        cursor = conn.cursor()
+        source = "index"
+        if dir_id(cursor, path) is None:
+            source = "disk"
+        else:
+            stored = directory_modified(cursor, path)
+            if stored is None or stored != mtime:
+                refresh_directory(cursor, path)
+                conn.commit()
+                source = "refreshed"
+        if source != "disk":
+            entries, total = directory_page(cursor, path, offset, limit)
+            return entries, total, source
+    finally:
+        conn.close()
+    return _disk_page(path, offset, limit) + ("disk",)
+
+
+def _by_database(paths, db_path):
+    groups = {}
+    for path, db in databases_for(paths, db_path).items():
+        groups.setdefault(db, []).append(path)
+    return groups
+
+
+def apply_delete(path, db_path="files.db"):
+    """Drop `path` from the index right after the executor deleted it."""
+    apply_deletes([path], db_path)
+
+
+def apply_deletes(paths, db_path="files.db"):
+    """apply_delete for a batch of paths, one transaction per DB."""
+    for db, group in _by_database(paths, db_path).items():
+        conn = connect(db, timeout=30)
+        try:
+            cursor = conn.cursor()
+            for path in group:
+                delete_path(cursor, path)
+            conn.commit()
+        finally:
+            conn.close()
+
+
+def apply_move(src, dest, db_path="files.db"):
+    """Re-point the index at `dest` right after the executor moved or renamed `src`.
+
+    Within one DB this is move_path; across shards (or when `src` was never
+    indexed) `dest` is listed from disk instead.
+    """
+    src_db = database_for(src, db_path)
+    dest_db = database_for(dest, db_path)
+
+    conn = connect(src_db, timeout=30)
+    try:
+        cursor = conn.cursor()
+        if src_db == dest_db:
+            move_path(cursor, src, dest)
+        else:
+            delete_path(cursor, src)
+            conn.commit()
+            conn.close()
+            conn = connect(dest_db, timeout=30)
+            cursor = conn.cursor()
+
+        if not _is_indexed(cursor, dest):
+            _index_path(cursor, dest)
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def apply_moves(moves, db_path="files.db"):
+    """apply_move for a batch of (src, dest) pairs.
+
+    Moves within one DB share a transaction; the rest go through apply_move.
+    """
+    local = {}
+    owners = databases_for([path for move in moves for path in move], db_path)
+    for src, dest in moves:
+        src_db = owners[src]
+        if src_db == owners[dest]:
+            local.setdefault(src_db, []).append((src, dest))
+        else:
+            apply_move(src, dest, db_path)
+
+    for db, group in local.items():
+        conn = connect(db, timeout=30)
+        try:
+            cursor = conn.cursor()
+            for src, dest in group:
+                move_path(cursor, src, dest)
+                if not _is_indexed(cursor, dest):
+                    _index_path(cursor, dest)
+            conn.commit()
+        finally:
+            conn.close()
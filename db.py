@@ -1,35 +1,1260 @@
 # db.py
+#
+# Directories live in dir_nodes (integer id + parent id + name) and files in
+# file_nodes (dir_id + name), so no full path is stored anywhere. The
+# `files` and `directories` views rebuild the old path-based rows for
+# existing queries; writers go through the helpers below.
+import hashlib
+import os
 import sqlite3
+import time
+
+STAGING_SUFFIX = "_staging"
+SHARD_DIR = "shards"  # next to the catalog DB; one shard DB per crawled root
+FRECENCY_HALF_LIFE = 7 * 24 * 3600  # seconds for an open to count half as much
+NODE_CHANGES_KEPT = 1000000  # node_changes rows kept for resolvers to catch up from
+NODE_CHANGES_TRIM_EVERY = 100  # generations between trims of node_changes
+
+
+class IndexConnection(sqlite3.Connection):
+    """Connection that remembers the directory ids it has resolved.
+
+    The ids are dropped whenever another connection has committed since
+    (PRAGMA data_version moved): a directory deleted there can hand its id
+    to a new one.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.dir_ids = {}
+        self.data_version = None  # PRAGMA data_version the ids were checked at
+        self.next_dir_id = None  # bulk loads assign staging ids themselves
+        self.bulk_root = None    # live id of the directory a bulk load is filling
+
+
+def connect(db_path="files.db", **kwargs):
+    return sqlite3.connect(db_path, factory=IndexConnection, **kwargs)
+
+
+def _join_sql(parent, name):
+    # SQL twin of os.path.join for the views: roots already end in a separator.
+    sep = os.sep
+    return (f"CASE WHEN substr({parent}, -1) = '{sep}' THEN {parent} || {name} "
+            f"ELSE {parent} || '{sep}' || {name} END")
+
+
+def _create_node_tables(cursor, suffix="", keyed=True):
+    # Staging tables carry no secondary indexes so bulk loads only append;
+    # the indexes are built once, at swap time.
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS dir_nodes{suffix} (
+        id INTEGER PRIMARY KEY,
+        parent_id INTEGER,
+        name TEXT,
+        modified REAL
+    )
+    """)
+
+    # `name` is the full entry name; `extension` its lowercased suffix.
+    id_column = "id INTEGER PRIMARY KEY," if keyed else ""
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS file_nodes{suffix} (
+        {id_column}
+        dir_id INTEGER,
+        name TEXT,
+        extension TEXT,
+        size INTEGER,
+        modified REAL
+    )
+    """)
+
+
+def _create_node_indexes(cursor):
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_dir_parent ON dir_nodes(parent_id, name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dir_name ON dir_nodes(name)")
+
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_file_dir ON file_nodes(dir_id, name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_name ON file_nodes(name)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ext ON file_nodes(extension)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_modified ON file_nodes(modified)")
+    # Metadata queries (file_query.py): largest first, and by type ordered
+    # by size or date without sorting every file of that type.
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_size ON file_nodes(size)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ext_size ON file_nodes(extension, size)")
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ext_modified ON file_nodes(extension, modified)")
+
+
+def _create_views(cursor):
+    tree = f"""
+    WITH RECURSIVE tree(id, path, parent) AS (
+        SELECT id, name, NULL FROM dir_nodes WHERE parent_id IS NULL
+        UNION ALL
+        SELECT d.id, {_join_sql("t.path", "d.name")}, t.path
+        FROM dir_nodes d JOIN tree t ON d.parent_id = t.id
+    )
+    """
+
+    cursor.execute(f"""
+    CREATE VIEW IF NOT EXISTS directories AS
+    {tree}
+    SELECT tree.path AS path, d.name AS name, tree.parent AS parent, d.modified AS modified
+    FROM tree JOIN dir_nodes d ON d.id = tree.id
+    WHERE tree.parent IS NOT NULL
+    """)
+
+    cursor.execute(f"""
+    CREATE VIEW IF NOT EXISTS files AS
+    {tree}
+    SELECT {_join_sql("tree.path", "f.name")} AS path,
+           substr(f.name, 1, length(f.name) - length(f.extension)) AS name,
+           f.extension AS extension,
+           f.size AS size,
+           f.modified AS modified,
+           tree.path AS parent
+    FROM file_nodes f JOIN tree ON tree.id = f.dir_id
+    """)
+
+
+def _object_type(cursor, name):
+    row = cursor.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return row[0] if row else None
+
+
+def _migrate_path_tables(conn):
+    """Move rows from the old path-keyed files/directories tables into the node tables."""
+    cursor = conn.cursor()
+    print("[DB] Migrating path tables to dir_nodes/file_nodes...")
+
+    dir_rows = cursor.execute(
+        "SELECT parent, name, modified FROM directories ORDER BY path").fetchall()
+    insert_directories(cursor, dir_rows)
+
+    file_rows = cursor.execute(
+        "SELECT path, extension, size, modified FROM files").fetchall()
+    insert_files(cursor, [
+        (os.path.dirname(path), os.path.basename(path), extension, size, modified)
+        for path, extension, size, modified in file_rows
+    ])
+
+    cursor.execute("DROP TABLE files")
+    cursor.execute("DROP TABLE directories")
+    print(f"[DB] Migrated {len(file_rows)} files and {len(dir_rows)} directories.")
+
 
 def init_db(db_path="files.db"):
-    conn = sqlite3.connect(db_path)
+    conn = connect(db_path)
     cursor = conn.cursor()
 
+    legacy = _object_type(cursor, "files") == "table"
+    if legacy:
+        # The old tables' index names are reused for the node tables.
+        for index in ("idx_name", "idx_ext", "idx_modified", "idx_file_parent",
+                      "idx_dir_name", "idx_dir_parent"):
+            cursor.execute(f"DROP INDEX IF EXISTS {index}")
+
+    _create_node_tables(cursor)
+    _create_node_indexes(cursor)
+
+    if legacy:
+        _migrate_path_tables(conn)
+
+    _create_views(cursor)
+
     cursor.execute("""
-    CREATE TABLE IF NOT EXISTS files (
+    CREATE TABLE IF NOT EXISTS roots (
         path TEXT PRIMARY KEY,
+        indexed REAL
+    )
+    """)
+
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS crawl_runs (
+        id INTEGER PRIMARY KEY,
+        root TEXT,
+        kind TEXT,
+        status TEXT,
+        started REAL,
+        finished REAL,
+        last_commit REAL,
+        files INTEGER DEFAULT 0,
+        directories INTEGER DEFAULT 0,
+        errors INTEGER DEFAULT 0,
+        -- refresh runs only: entries added/updated/removed, directories re-listed
+        changed INTEGER DEFAULT 0,
+        relisted INTEGER DEFAULT 0
+    )
+    """)
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(crawl_runs)")]
+    if "changed" not in columns:
+        cursor.execute("ALTER TABLE crawl_runs ADD COLUMN changed INTEGER DEFAULT 0")
+        cursor.execute("ALTER TABLE crawl_runs ADD COLUMN relisted INTEGER DEFAULT 0")
+
+    # Catalog of per-root shard DBs; only used in the main files.db.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS shards (
+        root TEXT PRIMARY KEY,
+        path TEXT,
+        registered REAL
+    )
+    """)
+
+    # Directories of a run whose subtrees haven't been committed yet.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS crawl_frontier (
+        run_id INTEGER,
+        path TEXT,
+        PRIMARY KEY (run_id, path)
+    )
+    """)
+
+    # `generation` goes up with every write to the node tables, so copies of
+    # the index kept elsewhere (resolver snapshots) can tell they are stale.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS index_meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER
+    )
+    """)
+    cursor.execute("INSERT OR IGNORE INTO index_meta (key, value) VALUES ('generation', 0)")
+
+    _create_change_log(cursor)
+    _create_frecency_table(cursor)
+    _create_rollup_table(cursor)
+
+    conn.commit()
+    conn.close()
+
+
+def generation(cursor):
+    """Current write generation of the node tables, or None for a DB without one."""
+    try:
+        row = cursor.execute("SELECT value FROM index_meta WHERE key = 'generation'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def _bump_generation(cursor):
+    """Start a new write generation; returns it, None for a DB without one."""
+    try:
+        cursor.execute("UPDATE index_meta SET value = value + 1 WHERE key = 'generation'")
+    except sqlite3.OperationalError:
+        return None  # created before index_meta; nothing can be cached against it anyway
+    current = generation(cursor)
+    if current is not None and current % NODE_CHANGES_TRIM_EVERY == 0:
+        _trim_change_log(cursor)
+    return current
+
+
+def _create_change_log(cursor):
+    # Every node the writers below add to or drop from the live tables, by
+    # the generation that did it, so resolvers in other processes can apply
+    # just those (see node_changes). The log is complete for generations
+    # after index_meta 'changes_since'; older rows are trimmed, and a bulk
+    # load, which renumbers rows, starts it over.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS node_changes (
+        generation INTEGER,
+        node INTEGER,
         name TEXT,
-        extension TEXT,
+        added INTEGER
+    )
+    """)
+    cursor.execute("CREATE INDEX IF NOT EXISTS idx_node_changes ON node_changes(generation)")
+    cursor.execute("INSERT OR IGNORE INTO index_meta (key, value) "
+                   "SELECT 'changes_since', value FROM index_meta WHERE key = 'generation'")
+
+
+def _log_nodes(cursor, current, nodes, added):
+    """Record (node, name) rows added to or dropped from the live tables at generation `current`."""
+    if current is not None:
+        cursor.executemany("INSERT INTO node_changes (generation, node, name, added) VALUES (?, ?, ?, ?)",
+                           [(current, node, name, int(added)) for node, name in nodes])
+
+
+def _log_new_rows(cursor, current, table, last_id):
+    # Rows get ids above every existing one, so the new ones are a range.
+    sign = "-" if table == "dir_nodes" else ""
+    if current is not None:
+        cursor.execute(f"""
+        INSERT INTO node_changes (generation, node, name, added)
+        SELECT ?, {sign}id, name, 1 FROM {table} WHERE id > ?
+        """, (current, last_id))
+
+
+def _last_id(cursor, table):
+    return cursor.execute(f"SELECT coalesce(max(id), 0) FROM {table}").fetchone()[0]
+
+
+def _trim_change_log(cursor):
+    row = cursor.execute("SELECT max(rowid) FROM node_changes").fetchone()
+    if row[0] is None or row[0] <= NODE_CHANGES_KEPT:
+        return
+    cutoff = cursor.execute("SELECT generation FROM node_changes WHERE rowid <= ? ORDER BY rowid DESC LIMIT 1",
+                            (row[0] - NODE_CHANGES_KEPT,)).fetchone()
+    if cutoff is None:
+        return
+    # Whole generations go, so the log stays complete after 'changes_since'.
+    cursor.execute("DELETE FROM node_changes WHERE generation <= ?", (cutoff[0],))
+    cursor.execute("UPDATE index_meta SET value = max(value, ?) WHERE key = 'changes_since'", (cutoff[0],))
+
+
+def changes_since(cursor):
+    """Generation after which node_changes is complete, or None for a DB without the log."""
+    try:
+        row = cursor.execute("SELECT value FROM index_meta WHERE key = 'changes_since'").fetchone()
+    except sqlite3.OperationalError:
+        return None
+    return row[0] if row else None
+
+
+def node_changes(cursor, since):
+    """(generation, [(node, name, added)]) for every change after generation `since`, oldest first.
+
+    Read in one transaction. None when the log doesn't reach back to
+    `since` (it was trimmed, or a bulk load started it over) or the DB has
+    no log; the caller then has to rebuild from the tables.
+    """
+    cursor.execute("BEGIN")
+    try:
+        current = generation(cursor)
+        start = changes_since(cursor)
+        if current is None or since is None or start is None or not start <= since <= current:
+            return None
+        rows = cursor.execute("SELECT node, name, added FROM node_changes WHERE generation > ? ORDER BY rowid",
+                              (since,)).fetchall()
+        return current, rows
+    except sqlite3.OperationalError:
+        return None
+    finally:
+        cursor.connection.rollback()
+
+
+def _id_cache(cursor):
+    # Plain sqlite3 connections still work, they just don't keep the cache.
+    conn = cursor.connection
+    if not isinstance(conn, IndexConnection):
+        return {}
+    # Inside a transaction nobody else can have committed since its start.
+    if not conn.in_transaction:
+        _check_id_cache(conn)
+    return conn.dir_ids
+
+
+def _check_id_cache(conn):
+    if conn.next_dir_id is not None:
+        return  # a bulk load's staging ids live only in the cache
+    version = conn.execute("PRAGMA data_version").fetchone()[0]
+    if version != conn.data_version:
+        conn.dir_ids.clear()
+        conn.data_version = version
+
+
+def _begin_write(cursor):
+    """Take the write lock before any ids are looked up for a write.
+
+    From then on no other connection can commit, so the cached ids
+    checked here stay valid until this transaction ends.
+    """
+    conn = cursor.connection
+    if not conn.in_transaction:
+        cursor.execute("BEGIN IMMEDIATE")
+    if isinstance(conn, IndexConnection):
+        _check_id_cache(conn)
+
+
+def dir_id(cursor, path, create=False):
+    """dir_nodes id of `path`, walking (and optionally creating) its ancestors."""
+    cache = _id_cache(cursor)
+    node_id = cache.get(path)
+    if node_id is not None:
+        return node_id
+
+    parent, name = os.path.split(path)
+    if not name and parent != path:
+        return dir_id(cursor, parent, create)  # trailing separator
+    if not name:
+        # A filesystem root ("C:\\", "/") is a parentless node named after itself.
+        parent_id, name = None, path
+    else:
+        parent_id = dir_id(cursor, parent, create)
+        if parent_id is None:
+            return None
+
+    row = cursor.execute("SELECT id FROM dir_nodes WHERE parent_id IS ? AND name = ?",
+                         (parent_id, name)).fetchone()
+    if row is not None:
+        node_id = row[0]
+    elif create:
+        current = _bump_generation(cursor)
+        cursor.execute("INSERT INTO dir_nodes (parent_id, name) VALUES (?, ?)", (parent_id, name))
+        node_id = cursor.lastrowid
+        _log_nodes(cursor, current, [(-node_id, name)], True)
+        if rollups_current(cursor):
+            cursor.execute("INSERT INTO dir_totals (id, size, files, unlisted) VALUES (?, 0, 0, 1)",
+                           (node_id,))
+            _add_totals(cursor, {parent_id: [0, 0, 1]})
+    else:
+        return None
+
+    cache[path] = node_id
+    return node_id
+
+
+def directory_paths(cursor):
+    """{dir id: full path} for every directory, rebuilt from the parent links."""
+    nodes = {
+        node_id: (parent_id, name)
+        for node_id, parent_id, name in cursor.execute("SELECT id, parent_id, name FROM dir_nodes")
+    }
+    paths = {}
+
+    for node_id in nodes:
+        chain = []
+        current = node_id
+        while current not in paths:
+            parent_id, name = nodes[current]
+            if parent_id is None or parent_id not in nodes:
+                paths[current] = name
+                break
+            chain.append(current)
+            current = parent_id
+
+        for child in reversed(chain):
+            parent_id, name = nodes[child]
+            paths[child] = os.path.join(paths[parent_id], name)
+
+    return paths
+
+
+def subtree_directories(cursor, root):
+    """{path: modified} for `root` and every directory below it."""
+    root_id = dir_id(cursor, root)
+    if root_id is None:
+        return {}
+    return dict(cursor.execute(f"""
+    WITH RECURSIVE sub(id, path, modified) AS (
+        SELECT id, ?, modified FROM dir_nodes WHERE id = ?
+        UNION ALL
+        SELECT d.id, {_join_sql("sub.path", "d.name")}, d.modified
+        FROM dir_nodes d JOIN sub ON d.parent_id = sub.id
+    )
+    SELECT path, modified FROM sub
+    """, (root, root_id)))
+
+
+def list_children(cursor, path):
+    """({file name: (size, modified)}, {dir name: modified}) stored directly under `path`."""
+    parent_id = dir_id(cursor, path)
+    if parent_id is None:
+        return {}, {}
+    files = {
+        name: (size, modified)
+        for name, size, modified in cursor.execute(
+            "SELECT name, size, modified FROM file_nodes WHERE dir_id = ?", (parent_id,))
+    }
+    dirs = dict(cursor.execute(
+        "SELECT name, modified FROM dir_nodes WHERE parent_id = ?", (parent_id,)))
+    return files, dirs
+
+
+def directory_page(cursor, path, offset, limit):
+    """One page of `path`'s listing: ([(name, is_dir, size, modified)], total entries).
+
+    Directories come first, then files, each by name, read in order off
+    idx_dir_parent and idx_file_dir. Returns None if `path` isn't indexed.
+    """
+    parent_id = dir_id(cursor, path)
+    if parent_id is None:
+        return None
+    dir_count = cursor.execute("SELECT count(*) FROM dir_nodes WHERE parent_id = ?", (parent_id,)).fetchone()[0]
+    file_count = cursor.execute("SELECT count(*) FROM file_nodes WHERE dir_id = ?", (parent_id,)).fetchone()[0]
+
+    entries = []
+    if offset < dir_count:
+        entries += [(name, True, None, modified) for name, modified in cursor.execute(
+            "SELECT name, modified FROM dir_nodes WHERE parent_id = ? ORDER BY name LIMIT ? OFFSET ?",
+            (parent_id, limit, offset))]
+    if len(entries) < limit:
+        entries += [(name, False, size, modified) for name, size, modified in cursor.execute(
+            "SELECT name, size, modified FROM file_nodes WHERE dir_id = ? ORDER BY name LIMIT ? OFFSET ?",
+            (parent_id, limit - len(entries), max(0, offset - dir_count)))]
+    return entries, dir_count + file_count
+
+
+def directory_modified(cursor, path):
+    """The mtime stored for the directory `path` when it was last listed, or None."""
+    row = cursor.execute("SELECT modified FROM dir_nodes WHERE id = ?", (dir_id(cursor, path),)).fetchone()
+    return row[0] if row else None
+
+
+# In-memory indexes that keep node ids instead of paths refer to a file by
+# its file_nodes id and to a directory by its dir_nodes id negated.
+
+def _rows_by_id(cursor, table, columns, ids):
+    ids = list(ids)
+    rows = []
+    for i in range(0, len(ids), 500):
+        chunk = ids[i:i + 500]
+        rows += cursor.execute(f"SELECT id, {columns} FROM {table} WHERE id IN ({','.join('?' * len(chunk))})",
+                               chunk).fetchall()
+    return rows
+
+
+def node_paths(cursor, nodes, dir_paths=None):
+    """{node id: full path} for the node ids (see above) whose rows still exist.
+
+    Parents are fetched a level at a time, so resolving many paths costs one
+    query per directory level rather than one per path. `dir_paths`, if
+    given, is a {dir id: path} cache that is read first and filled in.
+    """
+    known = dir_paths if dir_paths is not None else {}
+    files = {node: (parent_id, name)
+             for node, parent_id, name in _rows_by_id(cursor, "file_nodes", "dir_id, name",
+                                                      [n for n in nodes if n > 0])}
+    dirs = {}
+    wanted = {-n for n in nodes if n < 0} | {parent_id for parent_id, _ in files.values()}
+    wanted -= known.keys()
+    while wanted:
+        rows = _rows_by_id(cursor, "dir_nodes", "parent_id, name", wanted)
+        dirs.update((node_id, (parent_id, name)) for node_id, parent_id, name in rows)
+        wanted = {parent_id for _, parent_id, _ in rows
+                  if parent_id is not None and parent_id not in dirs and parent_id not in known}
+
+    def dir_path(node_id):
+        if node_id in known:
+            return known[node_id]
+        if node_id not in dirs:
+            return None
+        parent_id, name = dirs[node_id]
+        if parent_id is None:
+            path = name
+        else:
+            parent = dir_path(parent_id)
+            if parent is None:
+                return None
+            path = os.path.join(parent, name)
+        known[node_id] = path
+        return path
+
+    found = {}
+    for node in nodes:
+        if node > 0:
+            if node not in files:
+                continue
+            parent = dir_path(files[node][0])
+            path = os.path.join(parent, files[node][1]) if parent is not None else None
+        else:
+            path = dir_path(-node)
+        if path is not None:
+            found[node] = path
+    return found
+
+
+def subtree_nodes(cursor, path):
+    """[(node id, name)] for `path` and everything indexed below it, `path` first."""
+    root_id = dir_id(cursor, path)
+    if root_id is None:
+        parent, name = os.path.split(path)
+        parent_id = dir_id(cursor, parent)
+        if parent_id is None:
+            return []
+        return cursor.execute("SELECT id, name FROM file_nodes WHERE dir_id = ? AND name = ?",
+                              (parent_id, name)).fetchall()
+
+    subtree = """
+    WITH RECURSIVE sub(id, name, depth) AS (
+        SELECT id, name, 0 FROM dir_nodes WHERE id = ?
+        UNION ALL
+        SELECT d.id, d.name, sub.depth + 1 FROM dir_nodes d JOIN sub ON d.parent_id = sub.id
+    )
+    """
+    nodes = cursor.execute(subtree + "SELECT -id, name FROM sub ORDER BY depth",
+                           (root_id,)).fetchall()
+    nodes += cursor.execute(subtree + "SELECT f.id, f.name FROM file_nodes f JOIN sub ON f.dir_id = sub.id",
+                            (root_id,)).fetchall()
+    return nodes
+
+
+def insert_files(cursor, rows, suffix=""):
+    """rows: (parent path, file name, extension, size, modified)."""
+    if not suffix:
+        if not rows:
+            return
+        _begin_write(cursor)
+    values = [
+        (dir_id(cursor, parent, create=True), name, extension, size, modified)
+        for parent, name, extension, size, modified in rows
+    ]
+    if suffix:
+        cursor.executemany(f"""
+        INSERT INTO file_nodes{suffix} (dir_id, name, extension, size, modified)
+        VALUES (?, ?, ?, ?, ?)
+        """, values)
+        return
+
+    if not values:
+        return
+    current = _bump_generation(cursor)
+    last_id = _last_id(cursor, "file_nodes")
+    if rollups_current(cursor):
+        sizes = {(parent_id, name): size or 0 for parent_id, name, _, size, _ in values}
+        deltas = {}
+        for (parent_id, name), size in sizes.items():
+            old = cursor.execute("SELECT size FROM file_nodes WHERE dir_id = ? AND name = ?",
+                                 (parent_id, name)).fetchone()
+            delta = deltas.setdefault(parent_id, [0, 0, 0])
+            delta[0] += size - ((old[0] or 0) if old else 0)
+            delta[1] += old is None
+        _add_totals(cursor, deltas)
+    cursor.executemany("""
+    INSERT INTO file_nodes (dir_id, name, extension, size, modified)
+    VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT(dir_id, name) DO UPDATE SET
+        extension = excluded.extension,
+        size = excluded.size,
+        modified = excluded.modified
+    """, values)
+    _log_new_rows(cursor, current, "file_nodes", last_id)
+
+
+def insert_directories(cursor, rows, suffix=""):
+    """rows: (parent path, directory name, modified).
+
+    `modified` is None for a directory that was found but not listed yet;
+    that keeps the mtime of one listed before (see set_directories_modified).
+    """
+    if suffix:
+        # Bulk load: staging has no (parent_id, name) index to look ids up
+        # in, so they are handed out here and kept in the connection cache.
+        conn = cursor.connection
+        cache = _id_cache(cursor)
+        values = []
+        for parent, name, modified in rows:
+            path = os.path.join(parent, name)
+            node_id = cache.get(path)
+            if node_id is None:
+                node_id = conn.next_dir_id
+                conn.next_dir_id += 1
+                cache[path] = node_id
+            values.append((node_id, dir_id(cursor, parent, create=True), name, modified))
+        cursor.executemany(f"""
+        INSERT OR REPLACE INTO dir_nodes{suffix} (id, parent_id, name, modified)
+        VALUES (?, ?, ?, ?)
+        """, values)
+        return
+
+    if not rows:
+        return
+    _begin_write(cursor)
+    values = [
+        (dir_id(cursor, parent, create=True), name, modified)
+        for parent, name, modified in rows
+    ]
+    if not values:
+        return
+    current = _bump_generation(cursor)
+    last_id = _last_id(cursor, "dir_nodes")
+    upsert = """
+    INSERT INTO dir_nodes (parent_id, name, modified)
+    VALUES (?, ?, ?)
+    ON CONFLICT(parent_id, name) DO UPDATE SET modified = coalesce(excluded.modified, dir_nodes.modified)
+    """
+    if not rollups_current(cursor):
+        cursor.executemany(upsert, values)
+        _log_new_rows(cursor, current, "dir_nodes", last_id)
+        return
+
+    # One row at a time, to tell new directories from re-listed ones.
+    deltas = {}
+    for parent_id, name, modified in values:
+        old = cursor.execute("SELECT id, modified FROM dir_nodes WHERE parent_id = ? AND name = ?",
+                             (parent_id, name)).fetchone()
+        cursor.execute(upsert, (parent_id, name, modified))
+        if old is None:
+            cursor.execute("INSERT INTO dir_totals (id, size, files, unlisted) VALUES (?, 0, 0, ?)",
+                           (cursor.lastrowid, int(modified is None)))
+            if modified is None:
+                deltas.setdefault(parent_id, [0, 0, 0])[2] += 1
+        elif old[1] is None and modified is not None:
+            deltas.setdefault(old[0], [0, 0, 0])[2] -= 1
+    _add_totals(cursor, deltas)
+    _log_new_rows(cursor, current, "dir_nodes", last_id)
+
+
+def set_directory_modified(cursor, path, modified):
+    if dir_id(cursor, path) is not None:
+        set_directories_modified(cursor, [(path, modified)])
+
+
+def set_directories_modified(cursor, rows, suffix=""):
+    """rows: (path, modified) of directories whose entries have just been stored."""
+    if not rows:
+        return
+    if not suffix:
+        _begin_write(cursor)
+    values = [(modified, dir_id(cursor, path, create=True)) for path, modified in rows]
+    if not values:
+        return
+    if not suffix and rollups_current(cursor):
+        # A directory listed for the first time no longer leaves its own
+        # and its ancestors' totals short.
+        listed = {}
+        for modified, node_id in values:
+            cursor.execute("UPDATE dir_nodes SET modified = ? WHERE id = ? AND modified IS NULL",
+                           (modified, node_id))
+            if cursor.rowcount > 0:
+                listed[node_id] = [0, 0, -1]
+        _add_totals(cursor, listed)
+    cursor.executemany(f"UPDATE dir_nodes{suffix} SET modified = ? WHERE id = ?", values)
+    if suffix:
+        # The root of a bulk load keeps its live row.
+        root_id = cursor.connection.bulk_root
+        cursor.executemany("UPDATE dir_nodes SET modified = ? WHERE id = ?",
+                           [row for row in values if row[1] == root_id])
+
+
+def delete_files(cursor, parent, names):
+    if not names:
+        return
+    _begin_write(cursor)
+    parent_id = dir_id(cursor, parent)
+    if parent_id is None or not names:
+        return
+    current = _bump_generation(cursor)
+    if current is not None:
+        cursor.executemany("""
+        INSERT INTO node_changes (generation, node, name, added)
+        SELECT ?, id, name, 0 FROM file_nodes WHERE dir_id = ? AND name = ?
+        """, [(current, parent_id, name) for name in set(names)])
+    if rollups_current(cursor):
+        delta = [0, 0, 0]
+        for name in set(names):
+            row = cursor.execute("SELECT size FROM file_nodes WHERE dir_id = ? AND name = ?",
+                                 (parent_id, name)).fetchone()
+            if row is not None:
+                delta[0] -= row[0] or 0
+                delta[1] -= 1
+        _add_totals(cursor, {parent_id: delta})
+    cursor.executemany("DELETE FROM file_nodes WHERE dir_id = ? AND name = ?",
+                       [(parent_id, name) for name in names])
+
+
+def _delete_node_subtree(cursor, node_id):
+    subtree = """
+    WITH RECURSIVE sub(id) AS (
+        SELECT ?
+        UNION ALL
+        SELECT d.id FROM dir_nodes d JOIN sub ON d.parent_id = sub.id
+    )
+    """
+    current = _bump_generation(cursor)
+    if current is not None:
+        cursor.execute(subtree + """
+        INSERT INTO node_changes (generation, node, name, added)
+        SELECT ?, id, name, 0 FROM file_nodes WHERE dir_id IN (SELECT id FROM sub)
+        UNION ALL
+        SELECT ?, -id, name, 0 FROM dir_nodes WHERE id IN (SELECT id FROM sub)
+        """, (node_id, current, current))
+    if rollups_current(cursor):
+        totals = _node_totals(cursor, node_id)
+        parent_id = cursor.execute("SELECT parent_id FROM dir_nodes WHERE id = ?", (node_id,)).fetchone()
+        if parent_id is not None:
+            _add_totals(cursor, {parent_id[0]: [-count for count in totals]})
+        cursor.execute(subtree + "DELETE FROM dir_totals WHERE id IN (SELECT id FROM sub)", (node_id,))
+    cursor.execute(subtree + "DELETE FROM file_nodes WHERE dir_id IN (SELECT id FROM sub)", (node_id,))
+    cursor.execute(subtree + "DELETE FROM dir_nodes WHERE id IN (SELECT id FROM sub)", (node_id,))
+
+
+def delete_subtree(cursor, path):
+    """Remove the directory `path` and everything indexed below it."""
+    _begin_write(cursor)
+    node_id = dir_id(cursor, path)
+    if node_id is None:
+        return
+    _delete_node_subtree(cursor, node_id)
+    _id_cache(cursor).clear()
+
+
+def delete_path(cursor, path):
+    """Remove `path`, a file or a whole directory, from the index."""
+    delete_subtree(cursor, path)
+    parent, name = os.path.split(path)
+    delete_files(cursor, parent, [name])
+
+
+def move_path(cursor, src, dest):
+    """Re-point the rows for `src` (a file or a whole directory) at `dest`.
+
+    A directory move is a single row update: everything below it follows
+    through the parent links. Its totals come off the old ancestors and go
+    onto the new ones.
+    """
+    src_parent, src_name = os.path.split(src)
+    dest_parent, dest_name = os.path.split(dest)
+    _begin_write(cursor)
+    src_dir = dir_id(cursor, src_parent)
+    if src_dir is None:
+        return
+    dest_dir = dir_id(cursor, dest_parent, create=True)
+    current = _bump_generation(cursor)
+    kept = rollups_current(cursor)
+
+    moved = cursor.execute("SELECT id FROM dir_nodes WHERE parent_id = ? AND name = ?",
+                           (src_dir, src_name)).fetchone()
+    if moved is not None:
+        replaced = cursor.execute("SELECT id FROM dir_nodes WHERE parent_id = ? AND name = ?",
+                                  (dest_dir, dest_name)).fetchone()
+        if replaced is not None and replaced[0] != moved[0]:
+            _delete_node_subtree(cursor, replaced[0])
+        totals = _node_totals(cursor, moved[0]) if kept else None
+        if totals:
+            _add_totals(cursor, {src_dir: [-count for count in totals]})
+        cursor.execute("UPDATE dir_nodes SET parent_id = ?, name = ? WHERE id = ?",
+                       (dest_dir, dest_name, moved[0]))
+        _log_nodes(cursor, current, [(-moved[0], src_name)], False)
+        _log_nodes(cursor, current, [(-moved[0], dest_name)], True)
+        if totals:
+            _add_totals(cursor, {dest_dir: list(totals)})
+        _id_cache(cursor).clear()
+        return
+
+    file_row = "SELECT size, id FROM file_nodes WHERE dir_id = ? AND name = ?"
+    moved = cursor.execute(file_row, (src_dir, src_name)).fetchone()
+    if moved is None or (src_dir, src_name) == (dest_dir, dest_name):
+        return
+    # The row at `dest`, if any, is replaced by the moved one.
+    replaced = cursor.execute(file_row, (dest_dir, dest_name)).fetchone()
+    dropped = [(moved[1], src_name)] + ([(replaced[1], dest_name)] if replaced else [])
+    _log_nodes(cursor, current, dropped, False)
+    _log_nodes(cursor, current, [(moved[1], dest_name)], True)
+    if kept:
+        size = moved[0] or 0
+        deltas = {src_dir: [-size, -1, 0]}
+        delta = deltas.setdefault(dest_dir, [0, 0, 0])
+        delta[0] += size - ((replaced[0] or 0) if replaced else 0)
+        delta[1] += replaced is None
+        _add_totals(cursor, deltas)
+
+    extension = os.path.splitext(dest_name)[1].lower()
+    cursor.execute("""
+    UPDATE OR REPLACE file_nodes SET dir_id = ?, name = ?, extension = ?
+    WHERE dir_id = ? AND name = ?
+    """, (dest_dir, dest_name, extension, src_dir, src_name))
+
+
+def _create_rollup_table(cursor):
+    # Recursive size, file count and count of directories not listed yet
+    # per directory. They are current while index_meta has a 'rollups'
+    # row: rebuild_rollups sets it, and from then on the writers above
+    # keep the totals in step, in the same transaction as their rows.
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS dir_totals (
+        id INTEGER PRIMARY KEY,
         size INTEGER,
-        modified REAL
+        files INTEGER,
+        unlisted INTEGER
     )
     """)
+    columns = [row[1] for row in cursor.execute("PRAGMA table_info(dir_totals)")]
+    if "unlisted" not in columns:
+        cursor.execute("ALTER TABLE dir_totals ADD COLUMN unlisted INTEGER")
+        cursor.execute("DELETE FROM index_meta WHERE key = 'rollups'")
+    # Rollups used to be rebuilt whenever this fell behind the generation.
+    cursor.execute("DELETE FROM index_meta WHERE key = 'rollup_generation'")
+
+
+def rollups_current(cursor):
+    """Whether dir_totals is being kept up to date (see _create_rollup_table)."""
+    try:
+        return cursor.execute("SELECT 1 FROM index_meta WHERE key = 'rollups'").fetchone() is not None
+    except sqlite3.OperationalError:
+        return False
+
+
+def invalidate_rollups(cursor):
+    """Stop keeping dir_totals, e.g. for a crawl that rebuilds them when it is done."""
+    cursor.execute("DELETE FROM index_meta WHERE key = 'rollups'")
+
+
+def _node_totals(cursor, node_id):
+    row = cursor.execute("SELECT size, files, unlisted FROM dir_totals WHERE id = ?", (node_id,)).fetchone()
+    return row or (0, 0, 0)
+
+
+def _add_totals(cursor, deltas):
+    """deltas: {dir id: [size, files, unlisted]} added to that directory and all its ancestors."""
+    cursor.executemany("""
+    WITH RECURSIVE up(id) AS (
+        SELECT ?
+        UNION ALL
+        SELECT d.parent_id FROM dir_nodes d JOIN up ON d.id = up.id WHERE d.parent_id IS NOT NULL
+    )
+    UPDATE dir_totals SET size = size + ?, files = files + ?, unlisted = unlisted + ?
+    WHERE id IN (SELECT id FROM up)
+    """, [(node_id, *delta) for node_id, delta in deltas.items() if node_id is not None and any(delta)])
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_name ON files(name)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_ext ON files(extension)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_modified ON files(modified)")
 
+def rebuild_rollups(cursor):
+    """Recompute every directory's recursive size and file count; the caller commits."""
+    _create_rollup_table(cursor)
+    # Write first, so no other writer can slip in between the scan and the flag.
+    cursor.execute("DELETE FROM dir_totals")
+
+    parents = {}
+    totals = {}
+    for node_id, parent_id, modified in cursor.execute("SELECT id, parent_id, modified FROM dir_nodes"):
+        parents[node_id] = parent_id
+        totals[node_id] = [0, 0, int(modified is None)]
+    for node_id, size, files in cursor.execute(
+            "SELECT dir_id, coalesce(sum(size), 0), count(*) FROM file_nodes GROUP BY dir_id"):
+        if node_id in totals:
+            totals[node_id][:2] = [size, files]
+
+    depths = {}
+    for node_id in parents:
+        chain = []
+        while node_id in parents and node_id not in depths:
+            chain.append(node_id)
+            node_id = parents[node_id]
+        depth = depths.get(node_id, -1)
+        for node_id in reversed(chain):
+            depth += 1
+            depths[node_id] = depth
+
+    # Deepest first, so every directory is complete before it is added upwards.
+    for node_id in sorted(parents, key=depths.get, reverse=True):
+        parent_id = parents[node_id]
+        if parent_id in totals:
+            for i in range(3):
+                totals[parent_id][i] += totals[node_id][i]
+
+    cursor.executemany("INSERT INTO dir_totals (id, size, files, unlisted) VALUES (?, ?, ?, ?)",
+                       ((node_id, *counts) for node_id, counts in totals.items()))
+    cursor.execute("INSERT OR REPLACE INTO index_meta (key, value) VALUES ('rollups', 1)")
+
+
+def directory_totals(cursor, path):
+    """(size in bytes, file count) of everything indexed below `path`.
+
+    One primary-key lookup. None if `path` isn't indexed, the rollups
+    aren't current (a crawl is rebuilding them), or a directory in it
+    hasn't been listed yet (a priority pass stops at its depth budget),
+    since the totals would be short.
+    """
+    node_id = dir_id(cursor, path)
+    if node_id is None or not rollups_current(cursor):
+        return None
+    row = cursor.execute("SELECT size, files, unlisted FROM dir_totals WHERE id = ?", (node_id,)).fetchone()
+    if row is None or row[2]:
+        return None
+    return row[0], row[1]
+
+
+def _create_frecency_table(cursor):
+    # Paths the user opened, scored by how often and how recently; only
+    # used in the main files.db.
     cursor.execute("""
-    CREATE TABLE IF NOT EXISTS directories (
+    CREATE TABLE IF NOT EXISTS frecency (
         path TEXT PRIMARY KEY,
-        name TEXT,
-        parent TEXT,
-        modified REAL
+        score REAL,
+        visits INTEGER,
+        last_used REAL
     )
     """)
 
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dir_name ON directories(name)")
-    cursor.execute("CREATE INDEX IF NOT EXISTS idx_dir_parent ON directories(parent)")
+
+def decayed_score(score, last_used, now):
+    return score * 0.5 ** (max(now - last_used, 0) / FRECENCY_HALF_LIFE)
+
+
+def record_use(cursor, path, now=None):
+    """Count one open of `path`; returns its new score."""
+    now = time.time() if now is None else now
+    _create_frecency_table(cursor)
+    row = cursor.execute("SELECT score, visits, last_used FROM frecency WHERE path = ?",
+                         (path,)).fetchone()
+    score, visits = (decayed_score(row[0], row[2], now) + 1.0, row[1] + 1) if row else (1.0, 1)
+    cursor.execute("INSERT OR REPLACE INTO frecency (path, score, visits, last_used) VALUES (?, ?, ?, ?)",
+                   (path, score, visits, now))
+    return score
+
+
+def frecent_paths(cursor, limit, now=None):
+    """The `limit` highest-scoring (path, score) pairs, scores decayed to `now`."""
+    now = time.time() if now is None else now
+    try:
+        rows = cursor.execute("SELECT path, score, last_used FROM frecency").fetchall()
+    except sqlite3.OperationalError:
+        return []  # catalog predates frecency
+    scored = sorted(((decayed_score(score, last_used, now), path) for path, score, last_used in rows),
+                    reverse=True)
+    return [(path, score) for score, path in scored[:limit]]
+
+
+def _frecency_subtree(path):
+    prefix = path if path.endswith(os.sep) else path + os.sep
+    return "path = ? OR substr(path, 1, ?) = ?", (path, len(prefix), prefix), prefix
+
+
+def forget_frecency(cursor, path):
+    """Drop the usage history of `path` and everything below it."""
+    where, args, _ = _frecency_subtree(path)
+    try:
+        cursor.execute(f"DELETE FROM frecency WHERE {where}", args)
+    except sqlite3.OperationalError:
+        pass  # catalog predates frecency
+
+
+def move_frecency(cursor, src, dest):
+    """Carry the usage history of `src` and everything below it over to `dest`."""
+    where, args, prefix = _frecency_subtree(src)
+    try:
+        rows = cursor.execute(f"SELECT path, score, visits, last_used FROM frecency WHERE {where}",
+                              args).fetchall()
+    except sqlite3.OperationalError:
+        return  # catalog predates frecency
+    cursor.execute(f"DELETE FROM frecency WHERE {where}", args)
+    cursor.executemany(
+        "INSERT OR REPLACE INTO frecency (path, score, visits, last_used) VALUES (?, ?, ?, ?)",
+        [(dest if path == src else os.path.join(dest, path[len(prefix):]), score, visits, last_used)
+         for path, score, visits, last_used in rows])
+
+
+def begin_bulk_load(conn, root, resume=False):
+    """Switch `conn` to WAL with relaxed syncing and (re)create the staging tables.
+
+    Staging ids start above every live id; other connections keep adding
+    live rows during the load, so finish_bulk_load moves them up again.
+    """
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=OFF")
+    cursor = conn.cursor()
+    if not resume:
+        cursor.execute(f"DROP TABLE IF EXISTS dir_nodes{STAGING_SUFFIX}")
+        cursor.execute(f"DROP TABLE IF EXISTS file_nodes{STAGING_SUFFIX}")
+    _create_node_tables(cursor, STAGING_SUFFIX, keyed=False)
+
+    root_id = dir_id(cursor, root, create=True)
+    conn.bulk_root = root_id
+    conn.next_dir_id = 1 + max(
+        cursor.execute("SELECT coalesce(max(id), 0) FROM dir_nodes").fetchone()[0],
+        cursor.execute(f"SELECT coalesce(max(id), 0) FROM dir_nodes{STAGING_SUFFIX}").fetchone()[0],
+    )
+
+    if resume:
+        # Rebuild the path -> staging id map for the subtree loaded so far.
+        nodes = cursor.execute(
+            f"SELECT id, parent_id, name FROM dir_nodes{STAGING_SUFFIX} ORDER BY id").fetchall()
+        paths = {root_id: root}
+        children = {}
+        for node_id, parent_id, name in nodes:
+            children.setdefault(parent_id, []).append((node_id, name))
+        stack = [root_id]
+        while stack:
+            parent_id = stack.pop()
+            for node_id, name in children.get(parent_id, []):
+                paths[node_id] = os.path.join(paths[parent_id], name)
+                conn.dir_ids[paths[node_id]] = node_id
+                stack.append(node_id)
 
     conn.commit()
-    conn.close()
\ No newline at end of file
+
+
+def finish_bulk_load(conn, root):
+    """Swap the staging tables in for `root`'s part of the index in one transaction.
+
+    Rows outside `root` are carried over from the live tables, ids
+    included. Staged directories are renumbered above the live ids as they
+    are at swap time; the only live id staged rows point at is the root's.
+    In WAL mode readers keep seeing the old tables until the commit.
+    """
+    conn.commit()
+    cursor = conn.cursor()
+    root_id = conn.bulk_root
+    live_subtree = """
+    WITH RECURSIVE sub(id) AS (
+        SELECT ?
+        UNION ALL
+        SELECT d.id FROM dir_nodes d JOIN sub ON d.parent_id = sub.id
+    )
+    """
+
+    # Holds off other writers, so no live id is taken after the max is read.
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        live_max = cursor.execute("SELECT coalesce(max(id), 0) FROM dir_nodes").fetchone()[0]
+        base = cursor.execute(f"SELECT min(id) FROM dir_nodes{STAGING_SUFFIX}").fetchone()[0]
+        shift = live_max + 1 - base if base is not None else 0
+        _create_node_tables(cursor, "_new")
+        cursor.execute(live_subtree + """
+        INSERT INTO dir_nodes_new
+        SELECT * FROM dir_nodes WHERE id = ? OR id NOT IN (SELECT id FROM sub)
+        """, (root_id, root_id))
+        cursor.execute(f"""
+        INSERT INTO dir_nodes_new
+        SELECT id + ?, CASE WHEN parent_id = ? THEN parent_id ELSE parent_id + ? END, name, modified
+        FROM dir_nodes{STAGING_SUFFIX}
+        """, (shift, root_id, shift))
+        # Keep the ids of rows outside `root`: resolvers and snapshots refer
+        # to files by id, and the crawl never touched these.
+        cursor.execute(live_subtree + """
+        INSERT INTO file_nodes_new (id, dir_id, name, extension, size, modified)
+        SELECT id, dir_id, name, extension, size, modified FROM file_nodes
+        WHERE dir_id NOT IN (SELECT id FROM sub)
+        """, (root_id,))
+        # A resumed load can hold a directory's files twice; keep one copy.
+        cursor.execute(f"""
+        INSERT INTO file_nodes_new (dir_id, name, extension, size, modified)
+        SELECT CASE WHEN dir_id = ? THEN dir_id ELSE dir_id + ? END, name, extension, size, modified
+        FROM file_nodes{STAGING_SUFFIX}
+        WHERE rowid IN (SELECT max(rowid) FROM file_nodes{STAGING_SUFFIX} GROUP BY dir_id, name)
+        ORDER BY dir_id, name
+        """, (root_id, shift))
+
+        cursor.execute("DROP VIEW files")
+        cursor.execute("DROP VIEW directories")
+        cursor.execute("DROP TABLE file_nodes")
+        cursor.execute("DROP TABLE dir_nodes")
+        cursor.execute("ALTER TABLE dir_nodes_new RENAME TO dir_nodes")
+        cursor.execute("ALTER TABLE file_nodes_new RENAME TO file_nodes")
+        _create_node_indexes(cursor)
+        _create_views(cursor)
+
+        cursor.execute(f"DROP TABLE dir_nodes{STAGING_SUFFIX}")
+        cursor.execute(f"DROP TABLE file_nodes{STAGING_SUFFIX}")
+        # Staged rows got new ids, so the log can't be replayed across this.
+        current = _bump_generation(cursor)
+        cursor.execute("DELETE FROM node_changes")
+        cursor.execute("UPDATE index_meta SET value = ? WHERE key = 'changes_since'", (current,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    conn.next_dir_id = None
+    conn.bulk_root = None
+    conn.dir_ids.clear()   # staging ids, renumbered above
+    conn.execute("PRAGMA synchronous=NORMAL")
+
+
+def record_root(cursor, path):
+    cursor.execute("INSERT OR REPLACE INTO roots (path, indexed) VALUES (?, ?)", (path, time.time()))
+
+
+def shard_path(root, catalog_path="files.db"):
+    """Where the shard DB for `root` lives, e.g. shards/C_3a1f09c2.db."""
+    slug = "".join(c if c.isalnum() else "_" for c in root).strip("_") or "root"
+    digest = hashlib.sha1(root.encode("utf-8")).hexdigest()[:8]
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(catalog_path)), SHARD_DIR)
+    return os.path.join(shard_dir, f"{slug}_{digest}.db")
+
+
+def register_shard(cursor, root, path):
+    cursor.execute("INSERT OR REPLACE INTO shards (root, path, registered) VALUES (?, ?, ?)",
+                   (root, path, time.time()))
+
+
+def index_databases(catalog_path="files.db"):
+    """Every DB that holds index rows: the catalog itself plus its registered shards."""
+    databases = [catalog_path]
+    if not os.path.exists(catalog_path):
+        return databases
+
+    conn = sqlite3.connect(catalog_path)
+    try:
+        rows = conn.execute("SELECT path FROM shards ORDER BY root").fetchall()
+    except sqlite3.OperationalError:
+        rows = []  # catalog predates shards
+    finally:
+        conn.close()
+    databases.extend(path for (path,) in rows if path != catalog_path)
+    return databases
+
+
+def _shard_roots(catalog_path):
+    if not os.path.exists(catalog_path):
+        return []
+    conn = sqlite3.connect(catalog_path)
+    try:
+        return conn.execute("SELECT root, path FROM shards").fetchall()
+    except sqlite3.OperationalError:
+        return []
+    finally:
+        conn.close()
+
+
+def database_for(path, catalog_path="files.db"):
+    """The DB indexing `path`: the shard of the deepest registered root above it, else the catalog."""
+    return _owning_database(path, _shard_roots(catalog_path), catalog_path)
+
+
+def databases_for(paths, catalog_path="files.db"):
+    """{path: database_for(path)} for many paths, reading the shard list once."""
+    rows = _shard_roots(catalog_path)
+    return {path: _owning_database(path, rows, catalog_path) for path in paths}
+
+
+def _owning_database(path, rows, catalog_path):
+    best_root, best_db = "", catalog_path
+    for root, shard in rows:
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        if (path == root or path.startswith(prefix)) and len(root) > len(best_root):
+            best_root, best_db = root, shard
+    return best_db
+
+
+def start_crawl_run(cursor, root, kind):
+    now = time.time()
+    cursor.execute("""
+    INSERT INTO crawl_runs (root, kind, status, started, last_commit)
+    VALUES (?, ?, 'running', ?, ?)
+    """, (root, kind, now, now))
+    return cursor.lastrowid
+
+
+def update_crawl_run(cursor, run_id, files, directories, errors):
+    cursor.execute("""
+    UPDATE crawl_runs SET files = ?, directories = ?, errors = ?, last_commit = ?
+    WHERE id = ?
+    """, (files, directories, errors, time.time(), run_id))
+
+
+def update_refresh_run(cursor, run_id, changed, relisted, errors):
+    cursor.execute("""
+    UPDATE crawl_runs SET changed = ?, relisted = ?, errors = ?, last_commit = ?
+    WHERE id = ?
+    """, (changed, relisted, errors, time.time(), run_id))
+
+
+def mark_crawl_run(cursor, run_id, status):
+    cursor.execute("UPDATE crawl_runs SET status = ? WHERE id = ?", (status, run_id))
+
+
+def finish_crawl_run(cursor, run_id, status):
+    cursor.execute("UPDATE crawl_runs SET status = ?, finished = ? WHERE id = ?",
+                   (status, time.time(), run_id))
+    cursor.execute("DELETE FROM crawl_frontier WHERE run_id = ?", (run_id,))
+
+
+def find_unfinished_run(cursor, root, kind="full"):
+    """(run_id, files, directories, errors) of a crawl that never completed, or None."""
+    return cursor.execute("""
+    SELECT id, files, directories, errors FROM crawl_runs
+    WHERE root = ? AND kind = ? AND status != 'completed'
+    ORDER BY id DESC LIMIT 1
+    """, (root, kind)).fetchone()
+
+
+def load_frontier(cursor, run_id):
+    return [path for (path,) in cursor.execute(
+        "SELECT path FROM crawl_frontier WHERE run_id = ?", (run_id,))]
+
+
+def add_frontier(cursor, run_id, paths):
+    cursor.executemany("INSERT OR IGNORE INTO crawl_frontier (run_id, path) VALUES (?, ?)",
+                       [(run_id, p) for p in paths])
+
+
+def remove_frontier(cursor, run_id, paths):
+    cursor.executemany("DELETE FROM crawl_frontier WHERE run_id = ? AND path = ?",
+                       [(run_id, p) for p in paths])
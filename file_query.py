@@ -0,0 +1,282 @@
+# file_query.py
+# Metadata queries over the index: "largest files in downloads", "pdfs
+# modified this week", "videos over 1 gb". A phrase is parsed into a
+# FileQuery, compiled to one SELECT on file_nodes that the size, extension
+# and modified indexes can serve, and read back a page at a time so large
+# result sets are never held in memory at once.
+import heapq
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+from db import connect, database_for, dir_id, index_databases, node_paths
+
+PAGE_SIZE = 50
+DEFAULT_TOP = 10   # results for "largest files" and the like without a count
+
+TYPE_EXTENSIONS = {
+    "pdf": [".pdf"],
+    "video": [".mp4", ".mkv", ".avi", ".mov", ".wmv", ".webm", ".m4v"],
+    "movie": [".mp4", ".mkv", ".avi", ".mov", ".wmv", ".webm", ".m4v"],
+    "image": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".heic", ".tiff"],
+    "photo": [".jpg", ".jpeg", ".png", ".heic", ".raw"],
+    "picture": [".jpg", ".jpeg", ".png", ".gif", ".bmp", ".webp", ".heic"],
+    "music": [".mp3", ".flac", ".wav", ".m4a", ".aac", ".ogg", ".wma"],
+    "song": [".mp3", ".flac", ".wav", ".m4a", ".aac", ".ogg", ".wma"],
+    "audio": [".mp3", ".flac", ".wav", ".m4a", ".aac", ".ogg", ".wma"],
+    "document": [".pdf", ".doc", ".docx", ".odt", ".rtf", ".txt", ".md"],
+    "doc": [".doc", ".docx"],
+    "spreadsheet": [".xls", ".xlsx", ".csv", ".ods"],
+    "presentation": [".ppt", ".pptx", ".odp"],
+    "archive": [".zip", ".rar", ".7z", ".tar", ".gz"],
+    "zip": [".zip"],
+    "installer": [".exe", ".msi"],
+    "text": [".txt", ".md"],
+    "code": [".py", ".js", ".ts", ".c", ".cpp", ".h", ".java", ".cs", ".go", ".rs"],
+}
+
+# Kinds told apart by name rather than extension: (name prefix, type).
+NAME_PREFIXES = {
+    "screenshot": ("screenshot", "image"),
+    "screen recording": ("screen recording", "video"),
+}
+
+SIZE_UNITS = {"b": 1, "kb": 1024, "mb": 1024**2, "gb": 1024**3, "tb": 1024**4}
+_SIZE = re.compile(r"\b(over|above|larger than|bigger than|more than|at least|"
+                   r"under|below|smaller than|less than)\s+(\d+(?:\.\d+)?)\s*(tb|gb|mb|kb|b)\b")
+_SINCE = re.compile(r"\b(?:(?:modified|changed|edited|saved|created)\s+)?(today|yesterday|this week|"
+                    r"this month|this year|last week|last month|(?:in )?the last (\d+) (day|week|month)s?)\b")
+_ORDER = re.compile(r"\b(largest|biggest|smallest|newest|latest|most recent|recent|oldest)\b")
+_COUNT = re.compile(r"\b(?:top )?(\d+)\b")
+_LISTING = re.compile(r"(?:show|list|find|all)\b")
+_EXTENSION = re.compile(r"\b([a-z0-9]{1,5}) files?\b")   # "docx files"
+NOT_EXTENSIONS = {"all", "my", "the", "big", "large", "new", "old", "top", "recent", "some"}
+_SCOPE = re.compile(r"\s(?:in|inside|under|from)\s+(?:the |my )?(.+?)(?:\s+(?:folder|directory))?$")
+SCOPE_SUFFIXES = (" folder", " directory")
+
+
+class FileQuery:
+    """Filters and order of one metadata query; see compile_query."""
+
+    def __init__(self, extensions=None, min_size=None, max_size=None, since=None,
+                 order="modified", descending=True, limit=None, label="files", name_prefix=None):
+        self.extensions = extensions
+        self.name_prefix = name_prefix
+        self.min_size = min_size
+        self.max_size = max_size
+        self.since = since
+        self.order = order            # "size" or "modified"
+        self.descending = descending
+        self.limit = limit
+        self.label = label
+
+    def describe(self):
+        parts = [self.label]
+        if self.min_size is not None:
+            parts.append(f"over {human_size(self.min_size)}")
+        if self.max_size is not None:
+            parts.append(f"under {human_size(self.max_size)}")
+        if self.since is not None:
+            parts.append(f"modified since {datetime.fromtimestamp(self.since):%a %d %b %Y %H:%M}")
+        if self.order == "size":
+            parts.append("largest first" if self.descending else "smallest first")
+        else:
+            parts.append("newest first" if self.descending else "oldest first")
+        if self.limit:
+            parts.append(f"top {self.limit}")
+        return ", ".join(parts)
+
+
+def human_size(size):
+    for unit in ("tb", "gb", "mb", "kb"):
+        if size >= SIZE_UNITS[unit]:
+            return f"{size / SIZE_UNITS[unit]:.1f} {unit.upper()}"
+    return f"{size} B"
+
+
+def _since(match, now):
+    today = datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0)
+    phrase, count, unit = match.group(1), match.group(2), match.group(3)
+    if phrase == "today":
+        start = today
+    elif phrase == "yesterday":
+        start = today - timedelta(days=1)
+    elif phrase == "this week":
+        start = today - timedelta(days=today.weekday())
+    elif phrase == "this month":
+        start = today.replace(day=1)
+    elif phrase == "this year":
+        start = today.replace(month=1, day=1)
+    elif phrase == "last week":
+        start = today - timedelta(days=7)
+    elif phrase == "last month":
+        start = today - timedelta(days=30)
+    else:
+        start = today - timedelta(days=int(count) * {"day": 1, "week": 7, "month": 30}[unit])
+    return start.timestamp()
+
+
+def split_scope(target):
+    """Split "report in downloads" into ("report", "downloads"); (target, None) without a scope."""
+    if " in " not in target:
+        return target, None
+    name, scope = (part.strip() for part in target.rsplit(" in ", 1))
+    if scope.startswith("the "):
+        scope = scope[4:].strip()
+    for suffix in SCOPE_SUFFIXES:
+        if scope.endswith(suffix):
+            scope = scope[:-len(suffix)].strip()
+    if not name or not scope:
+        return target, None
+    return name, scope
+
+
+def parse_query(text, now=None):
+    """(FileQuery, scope or None) for a metadata query phrase, or (None, None) if it isn't one."""
+    text = " ".join((text or "").lower().replace("?", "").split())
+    now = time.time() if now is None else now
+    query = FileQuery()
+    filtered = False
+
+    match = _SIZE.search(text)
+    if match:
+        size = int(float(match.group(2)) * SIZE_UNITS[match.group(3)])
+        if match.group(1) in ("under", "below", "smaller than", "less than"):
+            query.max_size = size
+        else:
+            query.min_size, query.order = size, "size"
+        text = text[:match.start()] + text[match.end():]
+        filtered = True
+
+    match = _SINCE.search(text)
+    if match:
+        query.since = _since(match, now)
+        text = text[:match.start()] + text[match.end():]
+        filtered = True
+
+    match = _ORDER.search(text)
+    if match:
+        word = match.group(1)
+        query.order = "size" if word in ("largest", "biggest", "smallest") else "modified"
+        query.descending = word not in ("smallest", "oldest")
+        count = _COUNT.search(text)
+        query.limit = int(count.group(1)) if count else DEFAULT_TOP
+        filtered = True
+
+    head = text.split(" in ")[0]
+    named = next((phrase for phrase in NAME_PREFIXES if phrase in head), None)
+    if named:
+        prefix, kind = NAME_PREFIXES[named]
+        query.name_prefix, query.extensions, query.label = prefix, TYPE_EXTENSIONS[kind], named + "s"
+    else:
+        for word in re.findall(r"[a-z0-9.]+", head):
+            singular = word[:-1] if word.endswith("s") else word
+            if singular in TYPE_EXTENSIONS:
+                query.extensions, query.label = TYPE_EXTENSIONS[singular], singular + "s"
+                break
+            if word.startswith(".") and len(word) > 1:
+                query.extensions, query.label = [word], f"{word} files"
+                break
+        else:
+            match = _EXTENSION.search(text)
+            if match and match.group(1) not in NOT_EXTENSIONS and not match.group(1).isdigit():
+                query.extensions, query.label = ["." + match.group(1)], f".{match.group(1)} files"
+    # A type on its own ("open pdf") names a file; it takes a filter or a
+    # listing verb ("show pdfs in downloads") to make a query.
+    if not filtered and not (query.extensions and _LISTING.match(text)):
+        return None, None
+
+    scope = _SCOPE.search(" ".join(text.split()))
+    return query, (scope.group(1).strip() if scope else None)
+
+
+def compile_query(query, root_id=None):
+    """(sql, params) selecting (id, dir_id, name, size, modified) rows, optionally below dir `root_id`."""
+    clauses, params, prefix = [], [], ""
+    if query.extensions:
+        clauses.append(f"extension IN ({', '.join('?' * len(query.extensions))})")
+        params.extend(query.extensions)
+    if query.name_prefix:
+        clauses.append("name LIKE ? ESCAPE '\\'")
+        params.append(re.sub(r"([%_\\])", r"\\\1", query.name_prefix) + "%")
+    if query.min_size is not None:
+        clauses.append("size >= ?")
+        params.append(query.min_size)
+    if query.max_size is not None:
+        clauses.append("size < ?")
+        params.append(query.max_size)
+    if query.since is not None:
+        clauses.append("modified >= ?")
+        params.append(query.since)
+    if root_id is not None:
+        prefix = """
+        WITH RECURSIVE sub(id) AS (
+            SELECT ?
+            UNION ALL
+            SELECT d.id FROM dir_nodes d JOIN sub ON d.parent_id = sub.id
+        )
+        """
+        params.insert(0, root_id)
+        clauses.append("dir_id IN (SELECT id FROM sub)")
+
+    sql = prefix + "SELECT id, dir_id, name, size, modified FROM file_nodes"
+    if clauses:
+        sql += " WHERE " + " AND ".join(clauses)
+    sql += f" ORDER BY {query.order} {'DESC' if query.descending else 'ASC'}"
+    if query.limit:
+        sql += " LIMIT ?"
+        params.append(query.limit)
+    return sql, params
+
+
+def _rows(db_path, query, root):
+    """(path, size, modified) rows of one DB in query order, fetched a page at a time."""
+    conn = connect(db_path, timeout=30)
+    try:
+        cursor = conn.cursor()
+        root_id = None
+        if root is not None:
+            root_id = dir_id(cursor, root)
+            if root_id is None:
+                return
+        sql, params = compile_query(query, root_id)
+        rows = conn.cursor().execute(sql, params)
+        dir_paths = {}
+        while True:
+            page = rows.fetchmany(PAGE_SIZE)
+            if not page:
+                break
+            parents = node_paths(cursor, {-parent_id for _, parent_id, _, _, _ in page}, dir_paths)
+            for _, parent_id, name, size, modified in page:
+                parent = parents.get(-parent_id)
+                if parent is not None:
+                    yield os.path.join(parent, name), size, modified
+    finally:
+        conn.close()
+
+
+def run_query(query, db_path="files.db", scopes=None, page_size=PAGE_SIZE):
+    """Yield pages of (path, size, modified) for `query`, merged across the index DBs.
+
+    With `scopes`, only files below those directories are returned.
+    """
+    if scopes:
+        sources = [(database_for(scope, db_path), scope) for scope in scopes]
+    else:
+        sources = [(path, None) for path in index_databases(db_path)]
+
+    column = 1 if query.order == "size" else 2
+    merged = heapq.merge(*(_rows(path, query, root) for path, root in sources),
+                         key=lambda row: row[column], reverse=query.descending)
+    page, count = [], 0
+    for row in merged:
+        page.append(row)
+        count += 1
+        if len(page) == page_size:
+            yield page
+            page = []
+        if query.limit and count >= query.limit:
+            break
+    if page:
+        yield page
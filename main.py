@@ -1,8 +1,27 @@
 # main.py
-from db import init_db
-from crawler import crawl_and_index
+#   python main.py [roots...] [--shards] [--bulk] [--refresh]
+import sys
+from db import init_db, shard_path
+from crawler import crawl_and_index, crawl_priority, crawl_shards, refresh_index, register_shards
+
+ROOTS = ["C:\\"]     # Windows
+# ROOTS = ["/"]      # Linux
 
 if __name__ == "__main__":
     init_db()
-    crawl_and_index("C:\\")      # Windows
-    # crawl_and_index("/")       # Linux
\ No newline at end of file
+    roots = [arg for arg in sys.argv[1:] if not arg.startswith("--")] or ROOTS
+    sharded = "--shards" in sys.argv   # one DB and one crawl process per root/drive
+    bulk = "--bulk" in sys.argv        # staging tables + one index build, for first crawls
+
+    if "--refresh" in sys.argv:
+        for root in roots:             # only re-list directories that changed
+            refresh_index(root, shard_path(root) if sharded else "files.db")
+    else:
+        if sharded:                    # so the priority pass writes into the shards
+            register_shards(roots)
+        crawl_priority()               # home, Downloads, Documents, ... searchable first
+        if sharded:
+            crawl_shards(roots, bulk=bulk)
+        else:
+            for root in roots:
+                crawl_and_index(root, bulk=bulk)
@@ -1,13 +1,15 @@
 import multiprocessing as mp
 import queue
 import os
-import sqlite3
-from difflib import get_close_matches
+import time
 from intent_schema import Intent
 from schema import Event
+from resolver import DB_PATH, DbPathResolver
+from file_query import parse_query, run_query
+from crawler import list_directory
+from bulk_ops import bulk_targets, parse_bulk, preview, run_bulk, summarize
 
-DB_PATH = "files.db"
-FUZZY_CUTOFF = 0.6
+BULK_CONFIRM_WINDOW = 120  # seconds a bulk preview can be confirmed for
 
 SHELL_FOLDERS = {
     "download": "shell:Downloads",
@@ -23,108 +25,185 @@ SHELL_FOLDERS = {
 }
 
 
-class DbPathResolver:
-    def __init__(self, db_path=DB_PATH):
-        self.db_path = db_path
-        self.name_to_paths = {}
-        self.entry_count = 0
-        self._ready = False
-        self._load_index()
+_pending_bulk = {}  # the last previewed bulk action, waiting for "confirm"
 
-    def _add_key(self, key, path):
-        key = (key or "").strip().lower()
-        if not key:
-            return
-        existing = self.name_to_paths.setdefault(key, [])
-        if path not in existing:
-            existing.append(path)
-
-    def _load_index(self):
-        if not os.path.exists(self.db_path):
-            print(f"[EXECUTOR] DB not found: {self.db_path}")
-            self._ready = False
-            return
-
-        conn = None
-        try:
-            conn = sqlite3.connect(self.db_path)
-            cursor = conn.cursor()
 
-            file_rows = cursor.execute("SELECT name, extension, path FROM files").fetchall()
-            dir_rows = cursor.execute("SELECT name, path FROM directories").fetchall()
+def _folder(resolver: DbPathResolver, name):
+    """Best indexed directory for `name`, or None."""
+    return next((path for path in resolver.resolve(name) if os.path.isdir(path)), None)
 
-            for name, ext, path in file_rows:
-                base_name = (name or "").strip()
-                extension = (ext or "").strip()
 
-                self._add_key(base_name, path)
-                if extension:
-                    self._add_key(f"{base_name}{extension}", path)
+def _preview_bulk(intent: Intent, resolver: DbPathResolver):
+    request = parse_bulk(intent.target)
+    if request is None:
+        return "error", f"Could not understand '{intent.target}'.", None
 
-            for name, path in dir_rows:
-                self._add_key(name, path)
+    scope = destination = None
+    if request.scope:
+        scope = _folder(resolver, request.scope)
+        if scope is None:
+            return "error", f"No indexed folder matches '{request.scope}'.", None
+    if request.action == "move":
+        destination = _folder(resolver, request.destination)
+        if destination is None:
+            return "error", f"No indexed folder matches '{request.destination}'.", None
 
-            self.entry_count = len(self.name_to_paths)
-            self._ready = self.entry_count > 0
-            print(f"[EXECUTOR] DB index loaded: {self.entry_count} names.")
+    targets = bulk_targets(request, DB_PATH, scope, destination)
+    _pending_bulk.clear()
+    if not targets:
+        return "ok", f"No {request.query.label} to {request.action}{f' in {scope}' if scope else ''}.", None
+    _pending_bulk.update(request=request, targets=targets, destination=destination, at=time.time())
+    return "preview", f"{preview(request, targets, scope, destination)}. Say \"confirm\" to go ahead or \"cancel\".", None
 
-        except Exception as e:
-            print(f"[EXECUTOR] Failed to load DB index: {e}")
-            self._ready = False
-        finally:
-            if conn is not None:
-                conn.close()
-
-    def resolve(self, target):
-        query = (target or "").strip().strip("\"'").lower()
-        if not query or not self._ready:
-            return []
 
-        exact = self.name_to_paths.get(query)
-        if exact:
-            return exact
+def _confirm_bulk(resolver: DbPathResolver):
+    if not _pending_bulk:
+        return "error", "There is no bulk action waiting to be confirmed.", None
+    pending = dict(_pending_bulk)
+    _pending_bulk.clear()
+    if time.time() - pending["at"] > BULK_CONFIRM_WINDOW:
+        return "error", "That preview has expired; ask again to see the current files.", None
 
-        matches = get_close_matches(query, list(self.name_to_paths.keys()), n=1, cutoff=FUZZY_CUTOFF)
-        if not matches:
-            return []
-
-        return self.name_to_paths.get(matches[0], [])
+    done, failed = run_bulk(pending["request"], pending["targets"], resolver, pending["destination"])
+    status = "ok" if not failed else ("partial" if done else "error")
+    return status, summarize(pending["request"], done, failed, pending["destination"]), None
 
 
 def _execute_intent(intent: Intent, resolver: DbPathResolver):
+    """Run `intent`; returns (status, message, path opened or None)."""
     action = intent.action
     target = (intent.target or "").strip()
 
     if action in {"open_item", "open_folder"}:
-        resolved_paths = resolver.resolve(target)
+        resolved_paths = []
+        if intent.scope:
+            resolved_paths = resolver.resolve(target, scope=intent.scope)
+            if not resolved_paths:
+                # Maybe "in" was part of the name after all.
+                target = f"{target} in {intent.scope}"
+        if not resolved_paths:
+            resolved_paths = resolver.resolve(target)
         if resolved_paths:
             selected_path = resolved_paths[0]
             try:
                 os.startfile(selected_path)
             except Exception as e:
-                return "error", f"Open failed for '{selected_path}': {e}"
+                return "error", f"Open failed for '{selected_path}': {e}", None
 
             if len(resolved_paths) > 1:
-                return "ok", f"Opened {selected_path} (first match for '{target}')."
-            return "ok", f"Opened {selected_path}"
+                return "ok", f"Opened {selected_path} (best of {len(resolved_paths)} matches for '{target}').", selected_path
+            return "ok", f"Opened {selected_path}", selected_path
 
         shell_path = SHELL_FOLDERS.get(target.lower())
         try:
             if shell_path:
                 os.startfile(shell_path)
-                return "ok", f"Opened {target}"
+                return "ok", f"Opened {target}", None
         except Exception as e:
-            return "error", f"Open failed: {e}"
+            return "error", f"Open failed: {e}", None
+
+        return "error", f"No matching file or directory found in files.db for '{target}'.", None
 
-        return "error", f"No matching file or directory found in files.db for '{target}'."
+    if action == "bulk_action":
+        return _preview_bulk(intent, resolver)
+
+    if action == "confirm_bulk":
+        return _confirm_bulk(resolver)
+
+    if action == "cancel_bulk":
+        if _pending_bulk:
+            _pending_bulk.clear()
+            return "ok", "Bulk action cancelled.", None
+        return "no_intent", "Nothing to cancel.", None
 
     if action == "shutdown_system":
-        return "blocked", "Shutdown intent recognized, but execution is blocked by safety policy."
+        return "blocked", "Shutdown intent recognized, but execution is blocked by safety policy.", None
 
     if action == "unknown_command":
-        return "no_intent", f"No intent recognized for: {intent.raw_text}"
+        return "no_intent", f"No intent recognized for: {intent.raw_text}", None
+
+    return "error", f"Unsupported action: {action}", None
+
 
-    return "error", f"Unsupported action: {action}"
+def _query_results(intent: Intent, resolver: DbPathResolver):
+    """(status, message, extra payload) per page of a metadata query, then a closing summary.
+
+    Pages are read from the DB as they are sent, so a large result set is
+    never held here in full.
+    """
+    query, _ = parse_query(intent.target)
+    if query is None:
+        yield "error", f"Could not understand the query '{intent.target}'.", {"done": True}
+        return
+
+    scopes = None
+    if intent.scope:
+        scopes = [path for path in resolver.resolve(intent.scope) if os.path.isdir(path)]
+        if not scopes:
+            yield "error", f"No indexed folder matches '{intent.scope}'.", {"done": True}
+            return
+
+    total = 0
+    page_number = 0
+    for page_number, page in enumerate(run_query(query, DB_PATH, scopes), 1):
+        total += len(page)
+        yield "ok", f"{query.describe()}: page {page_number}, {total} so far", {
+            "results": page, "page": page_number, "done": False}
+
+    where = f" in {', '.join(scopes)}" if scopes else ""
+    yield "ok", f"{query.describe()}{where}: {total} file(s)", {
+        "results": [], "page": page_number + 1, "done": True}
+
+
+_listing = {"path": None, "offset": 0}  # last directory listed, for "more"
+
+
+def _list_results(intent: Intent, resolver: DbPathResolver):
+    """One page of a directory listing; "more" continues the last one."""
+    offset = 0
+    if intent.target == "more":
+        path, offset = _listing["path"], _listing["offset"]
+        if path is None:
+            yield "error", "Nothing is being listed yet.", {"done": True}
+            return
+    else:
+        path = _folder(resolver, intent.target)
+        if path is None:
+            yield "error", f"No indexed folder matches '{intent.target}'.", {"done": True}
+            return
+
+    try:
+        entries, total, source = list_directory(path, DB_PATH, offset)
+    except OSError as e:
+        yield "error", f"Could not list '{path}': {e}", {"done": True}
+        return
+    if not entries and total:
+        yield "ok", f"{path}: end of listing ({total} entries).", {"done": True}
+        return
+    shown = offset + len(entries)
+    _listing.update(path=path, offset=shown)
+    more = f"; say \"more\" for the next {min(total - shown, len(entries))}" if shown < total else ""
+    yield "ok", f"{path}: {offset + 1}-{shown} of {total} ({source}){more}", {
+        "entries": entries, "path": path, "done": shown >= total}
+
+
+STREAMED_ACTIONS = {"query_files": _query_results, "list_directory": _list_results}
+
+
+def _result_event(intent: Intent, status, message, **extra):
+    return Event.create(
+        event_type="RESULT_EVENT",
+        source="executor_01",
+        payload={
+            "status": status,
+            "message": message,
+            "action": intent.action,
+            "target": intent.target,
+            "source_intent_id": intent.intent_id,
+            **extra,
+        },
+        confidence=None,
+    )
 
 
 def executor_worker(executor_queue: mp.Queue, event_queue: mp.Queue, stop_event=None):
@@ -143,22 +222,23 @@ def executor_worker(executor_queue: mp.Queue, event_queue: mp.Queue, stop_event=
         if not isinstance(intent, Intent):
             continue
 
-        status, message = _execute_intent(intent, resolver)
-
-        result_event = Event.create(
-            event_type="RESULT_EVENT",
-            source="executor_01",
-            payload={
-                "status": status,
-                "message": message,
-                "action": intent.action,
-                "target": intent.target,
-                "source_intent_id": intent.intent_id,
-            },
-            confidence=None,
-        )
+        if intent.action in STREAMED_ACTIONS:
+            for status, message, extra in STREAMED_ACTIONS[intent.action](intent, resolver):
+                event_queue.put(_result_event(intent, status, message, **extra))
+                print(f"[EXECUTOR] {status}: {message}")
+            continue
+
+        status, message, path = _execute_intent(intent, resolver)
+        result_event = _result_event(intent, status, message, path=path)
 
         event_queue.put(result_event)
         print(f"[EXECUTOR] {status}: {message}")
 
+        if result_event.payload["status"] == "ok" and result_event.payload["path"]:
+            # Successful opens feed the resolver's frecency hot-set.
+            try:
+                resolver.record_use(result_event.payload["path"])
+            except Exception as e:
+                print(f"[EXECUTOR WARNING] Could not record use of {result_event.payload['path']}: {e}")
+
     print("[EXECUTOR] Stopped.")
@@ -1,11 +1,16 @@
+import os
 import sys
 import queue
+import threading
+import time
 import multiprocessing as mp
 from PyQt5.QtCore import QTimer
+from PyQt5.QtGui import QTextCursor
 from PyQt5.QtWidgets import (
     QApplication,
     QHBoxLayout,
     QLabel,
+    QListWidget,
     QMainWindow,
     QPushButton,
     QTextEdit,
@@ -13,11 +18,19 @@ from PyQt5.QtWidgets import (
     QWidget,
 )
 
+# db.py, crawler.py and resolver.py live one level up; spawned workers inherit sys.path.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from schema import Event
 from mic import mic_worker
 from router import router_worker
-from intent_engine import intent_worker
+from intent_engine import extract_open_target, intent_worker
 from executor import executor_worker
+from watcher import watcher_worker
+from indexer import crawler_worker
+from resolver import DB_PATH, DbPathResolver
+
+SUGGESTION_COUNT = 8
 
 
 class MainWindow(QMainWindow):
@@ -36,9 +49,14 @@ class MainWindow(QMainWindow):
 
         self._backend_processes = []
         self._mic_process = None
+        self._crawler_process = None
+        # Maps the same snapshot as the executor; suggestions come straight
+        # from it instead of a round trip through the pipeline queues.
+        self.resolver = None
 
         self._setup_ui()
         self._start_backend()
+        threading.Thread(target=self._load_resolver, name="gui-resolver", daemon=True).start()
 
         self.poll_timer = QTimer(self)
         self.poll_timer.timeout.connect(self._poll_results)
@@ -66,6 +84,14 @@ class MainWindow(QMainWindow):
         text_row.addWidget(self.send_button)
         layout.addLayout(text_row)
 
+        # Completions for the name after "open"
+        self.suggestions = QListWidget()
+        self.suggestions.setFixedHeight(110)
+        self.suggestions.hide()
+        self.suggestions.itemClicked.connect(self.on_suggestion)
+        self.input_box.textChanged.connect(self._update_suggestions)
+        layout.addWidget(self.suggestions)
+
         # Voice button
         self.mic_button = QPushButton("🎙  Start Listening")
         self.mic_button.setCheckable(True)
@@ -75,6 +101,14 @@ class MainWindow(QMainWindow):
         self.mic_status = QLabel("Mic: off")
         layout.addWidget(self.mic_status)
 
+        # Index
+        self.crawl_button = QPushButton("Re-index Drives")
+        self.crawl_button.clicked.connect(self.on_crawl)
+        layout.addWidget(self.crawl_button)
+
+        self.crawl_status = QLabel("Index: idle")
+        layout.addWidget(self.crawl_status)
+
         # Output
         layout.addWidget(QLabel("Pipeline Output:"))
         self.output = QTextEdit()
@@ -91,7 +125,7 @@ class MainWindow(QMainWindow):
     # -------------------------------------------------------- backend start --
 
     def _start_backend(self):
-        """Start router, intent, executor — but NOT the mic process."""
+        """Start router, intent, executor, watcher — but NOT the mic process."""
         router_process = self.ctx.Process(
             target=router_worker,
             args=(self.event_queue, self.intent_queue, self.ui_queue, self.pipeline_stop_event),
@@ -108,7 +142,13 @@ class MainWindow(QMainWindow):
             name="ExecutorProcess",
         )
 
-        self._backend_processes = [router_process, intent_process, executor_process]
+        watcher_process = self.ctx.Process(
+            target=watcher_worker,
+            args=(self.pipeline_stop_event,),
+            name="WatcherProcess",
+        )
+
+        self._backend_processes = [router_process, intent_process, executor_process, watcher_process]
         for p in self._backend_processes:
             p.start()
 
@@ -151,6 +191,60 @@ class MainWindow(QMainWindow):
         self.mic_status.setText("Mic: off")
         self._append("[GUI] Mic stopped.")
 
+    # ------------------------------------------------------- index control --
+
+    def on_crawl(self):
+        if self._crawler_process and self._crawler_process.is_alive():
+            return
+
+        self._crawler_process = self.ctx.Process(
+            target=crawler_worker,
+            args=(self.event_queue, None, self.pipeline_stop_event),
+            name="CrawlerProcess",
+        )
+        self._crawler_process.start()
+        self.crawl_button.setEnabled(False)
+        self.crawl_status.setText("Index: crawling…")
+        self._append("[GUI] Re-index started.")
+
+    def _show_crawl_progress(self, p):
+        errors = ", ".join(f"{name} {count}" for name, count in p.get("errors", {}).items()) or "none"
+        line = (f"{p['root']}: {p['files']} files, {p['directories']} dirs | "
+                f"{p['entries_per_sec']:.0f} entries/s | {p['in_flight']} in flight, "
+                f"{p['pending']} pending | {p['commit_ms']:.1f} ms/commit | errors: {errors}")
+
+        if p.get("stage") != "done":
+            self.crawl_status.setText(f"Index: {line}")
+            return
+
+        self.crawl_status.setText(f"Index: done in {p['elapsed']:.1f}s")
+        self._append(f"[CRAWL] {line}")
+        self._append(f"[CRAWL] scan {p['scan_seconds']:.1f}s across workers, "
+                     f"SQLite {p['db_seconds']:.1f}s")
+        for path, seconds, entries in p.get("subtrees", []):
+            self._append(f"[CRAWL]   {seconds:7.2f}s {entries:>9} entries  {path}")
+
+    # --------------------------------------------------------- suggestions --
+
+    def _load_resolver(self):
+        # Off the UI thread: without a current snapshot the first load scans the DB.
+        self.resolver = DbPathResolver(DB_PATH)
+
+    def _update_suggestions(self):
+        target = extract_open_target(self.input_box.toPlainText().strip().lower())
+        names = self.resolver.complete(target, SUGGESTION_COUNT) if target and self.resolver else []
+
+        self.suggestions.clear()
+        self.suggestions.addItems(names)
+        self.suggestions.setVisible(bool(names))
+
+    def on_suggestion(self, item):
+        text = self.input_box.toPlainText()
+        head = text[:text.lower().index("open") + len("open")]
+        self.input_box.setPlainText(f"{head} {item.text()}")
+        self.input_box.moveCursor(QTextCursor.End)
+        self.input_box.setFocus()
+
     # ---------------------------------------------------------- text input --
 
     def on_send_text(self):
@@ -180,6 +274,10 @@ class MainWindow(QMainWindow):
             self._append("[GUI] Mic process ended unexpectedly.")
             self._stop_mic()
 
+        if self._crawler_process is not None and not self._crawler_process.is_alive():
+            self._crawler_process = None
+            self.crawl_button.setEnabled(True)
+
         while True:
             try:
                 event = self.ui_queue.get_nowait()
@@ -196,6 +294,14 @@ class MainWindow(QMainWindow):
                 action = payload.get("action", "")
                 message = payload.get("message", "")
                 self._append(f"[RESULT] {status} | {action} | {message}")
+                # Metadata queries arrive a page of (path, size, modified) rows at a time.
+                for path, size, modified in payload.get("results", []):
+                    self._append(f"    {size / 2**20:10.1f} MB  {time.strftime('%Y-%m-%d %H:%M', time.localtime(modified))}  {path}")
+                # Directory listings arrive one page per command.
+                for name, is_dir, size, _ in payload.get("entries", []):
+                    self._append(f"    {name}{os.sep}" if is_dir else f"    {name}  ({size / 1024:,.1f} KB)")
+            elif event.event_type == "CRAWL_PROGRESS":
+                self._show_crawl_progress(event.payload)
             else:
                 self._append(f"[{event.event_type}] {event.payload}")
 
@@ -214,7 +320,11 @@ class MainWindow(QMainWindow):
             except Exception:
                 pass
 
-        for p in self._backend_processes:
+        processes = list(self._backend_processes)
+        if self._crawler_process is not None:
+            processes.append(self._crawler_process)  # checkpointed; resumes next run
+
+        for p in processes:
             p.join(timeout=3)
             if p.is_alive():
                 p.terminate()
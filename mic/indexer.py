@@ -0,0 +1,65 @@
+import os
+import queue
+import sqlite3
+
+from schema import Event
+from crawler import crawl_and_index
+from db import databases_for, index_databases
+
+DB_PATH = "files.db"
+PROGRESS_EVENT_TYPE = "CRAWL_PROGRESS"
+
+
+def _indexed_roots(catalog_path):
+    """Every root recorded in the catalog or one of its shards (main.py --shards)."""
+    roots = set()
+    for db_path in index_databases(catalog_path):
+        if not os.path.exists(db_path):
+            continue
+        conn = sqlite3.connect(db_path)
+        try:
+            roots.update(root for (root,) in conn.execute("SELECT path FROM roots"))
+        except sqlite3.OperationalError:
+            pass
+        finally:
+            conn.close()
+    return sorted(roots)
+
+
+def crawler_worker(event_queue, roots=None, stop_event=None):
+    """Re-crawl `roots` (default: every indexed root), reporting progress.
+
+    Each root goes into the DB that owns it: its shard if one is registered,
+    else files.db. Each progress report from crawl_and_index becomes a
+    CRAWL_PROGRESS event on `event_queue`; the router forwards those to the
+    GUI. Crawls are checkpointed, so one stopped by `stop_event` or
+    terminated on shutdown resumes next time.
+    """
+    print("[INDEXER] Started.")
+
+    def report(payload):
+        if stop_event is not None and stop_event.is_set():
+            raise KeyboardInterrupt  # crawl_and_index checkpoints the run on the way out
+        try:
+            event_queue.put_nowait(Event.create(
+                event_type=PROGRESS_EVENT_TYPE,
+                source="crawler",
+                payload=payload,
+            ))
+        except queue.Full:
+            pass  # progress is advisory; never stall the crawl on a busy queue
+
+    roots = roots or _indexed_roots(DB_PATH)
+    if not roots:
+        print("[INDEXER] No indexed roots in the DB; run main.py first.")
+
+    owners = databases_for(roots, DB_PATH)
+    for root in roots:
+        if stop_event is not None and stop_event.is_set():
+            break
+        try:
+            crawl_and_index(root, owners[root], progress=report)
+        except KeyboardInterrupt:
+            break
+
+    print("[INDEXER] Stopped.")
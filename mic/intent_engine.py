@@ -1,27 +1,76 @@
 import multiprocessing as mp
 import queue
 from intent_schema import Intent
+from file_query import SCOPE_SUFFIXES, parse_query, split_scope
+from bulk_ops import parse_bulk
 
+MORE_PHRASES = {"more", "list more", "show more", "next page", "next"}
+CONFIRM_PHRASES = {"confirm", "yes", "yes do it", "go ahead", "do it"}
+CANCEL_PHRASES = {"cancel", "no", "stop", "never mind"}
 
-def _extract_open_target(text: str):
+
+def _strip_article(text: str):
+    if text.startswith("the "):
+        return text[4:].strip()
+    return text
+
+
+def extract_open_target(text: str):
     if "open" not in text:
         return None
 
-    target = text.split("open", 1)[1].strip()
-    if target.startswith("the "):
-        target = target[4:].strip()
+    target = _strip_article(text.split("open", 1)[1].strip())
     return target or None
 
 
+def _list_target(text: str):
+    """("downloads", True) for "list the downloads folder"; the flag is set when a folder was named outright."""
+    target = text[len("list "):].strip()
+    explicit = target.startswith("contents of ")
+    if explicit:
+        target = target[len("contents of "):]
+    target = _strip_article(target)
+    for suffix in SCOPE_SUFFIXES:
+        if target.endswith(suffix):
+            target, explicit = target[:-len(suffix)].strip(), True
+    return target or None, explicit
+
+
 def _resolve_intent(text: str):
     if "shutdown" in text:
-        return "shutdown_system", None
+        return "shutdown_system", None, None
+
+    # "delete all .tmp files in downloads": previewed first, run on "confirm".
+    if parse_bulk(text) is not None:
+        return "bulk_action", text, None
+    if text in CONFIRM_PHRASES:
+        return "confirm_bulk", None, None
+    if text in CANCEL_PHRASES:
+        return "cancel_bulk", None, None
+
+    # "list the music folder" names a folder even though "music" is a file type.
+    if text.startswith("list ") and " in " not in text:
+        target, explicit = _list_target(text)
+        if explicit:
+            return "list_directory", target, None
+
+    # "largest files in downloads", "pdfs modified this week"; the executor
+    # parses the phrase again when it runs the query.
+    if "open" not in text:
+        query, scope = parse_query(text)
+        if query is not None:
+            return "query_files", text, scope
+
+    if text in MORE_PHRASES:
+        return "list_directory", "more", None
+    if text.startswith("list "):
+        return "list_directory", _list_target(text)[0], None
 
-    open_target = _extract_open_target(text)
+    open_target = extract_open_target(text)
     if open_target:
-        return "open_item", open_target
+        return ("open_item",) + split_scope(open_target)
 
-    return "unknown_command", text
+    return "unknown_command", text, None
 
 
 def intent_worker(intent_queue: mp.Queue, executor_queue: mp.Queue, stop_event=None):
@@ -38,16 +87,17 @@ def intent_worker(intent_queue: mp.Queue, executor_queue: mp.Queue, stop_event=N
             break
 
         text = str(event.payload).strip().lower()
-        action, target = _resolve_intent(text)
+        action, target, scope = _resolve_intent(text)
 
         intent = Intent.create(
             action=action,
             target=target,
             source_event_id=event.event_id,
-            raw_text=text
+            raw_text=text,
+            scope=scope
         )
 
         executor_queue.put(intent)
-        print(f"[INTENT] action={intent.action} target={intent.target}")
+        print(f"[INTENT] action={intent.action} target={intent.target} scope={intent.scope}")
 
     print("[INTENT] Stopped.")
\ No newline at end of file
@@ -10,14 +10,16 @@ class Intent:
     source_event_id: str
     timestamp: float
     raw_text: str = ""
+    scope: str | None = None
 
     @staticmethod
-    def create(action, target, source_event_id, raw_text=""):
+    def create(action, target, source_event_id, raw_text="", scope=None):
         return Intent(
             intent_id=str(uuid.uuid4()),
             action=action,
             target=target,
             source_event_id=source_event_id,
             timestamp=time.time(),
-            raw_text=raw_text
+            raw_text=raw_text,
+            scope=scope
         )
\ No newline at end of file
@@ -1,9 +1,16 @@
 import multiprocessing as mp
+import os
+import sys
 import time
+
+# db.py, crawler.py and resolver.py live one level up; spawned workers inherit sys.path.
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
 from mic import mic_worker
 from router import router_worker
 from intent_engine import intent_worker
 from executor import executor_worker
+from watcher import watcher_worker
 
 
 def _shutdown(processes, stop_event, queues):
@@ -55,12 +62,18 @@ def main():
         name="ExecutorProcess",
     )
 
-    processes = [mic_process, router_process, intent_process, executor_process]
+    watcher_process = ctx.Process(
+        target=watcher_worker,
+        args=(stop_event,),
+        name="WatcherProcess",
+    )
+
+    processes = [mic_process, router_process, intent_process, executor_process, watcher_process]
 
     for process in processes:
         process.start()
 
-    print("[MAIN] Pipeline running: mic -> router -> intent -> executor")
+    print("[MAIN] Pipeline running: mic -> router -> intent -> executor (+ index watcher)")
     print("[MAIN] Press Ctrl+C to stop.")
 
     try:
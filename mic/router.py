@@ -5,6 +5,7 @@ from schema import Event
 
 INPUT_EVENT_TYPES = {"VOICE_TEXT", "TEXT_INPUT"}
 RESULT_EVENT_TYPE = "RESULT_EVENT"
+UI_EVENT_TYPES = {RESULT_EVENT_TYPE, "CRAWL_PROGRESS"}
 
 
 def router_worker(
@@ -36,7 +37,7 @@ def router_worker(
 
         if event.event_type in INPUT_EVENT_TYPES:
             intent_queue.put(event)
-        elif event.event_type == RESULT_EVENT_TYPE and ui_queue is not None:
+        elif event.event_type in UI_EVENT_TYPES and ui_queue is not None:
             ui_queue.put(event)
 
     print("[ROUTER] Stopped.")
\ No newline at end of file
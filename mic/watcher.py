@@ -0,0 +1,242 @@
+import os
+import sqlite3
+import threading
+import time
+
+from crawler import refresh_directory, refresh_index
+from db import connect, index_databases, move_path, SHARD_DIR
+
+DB_PATH = "files.db"
+DEBOUNCE_SECONDS = 1.0     # quiet period before a burst is written
+MAX_DELAY_SECONDS = 10.0   # write anyway if events never stop
+DIRS_PER_TRANSACTION = 200
+POLL_INTERVAL = 300.0      # refresh_index cadence when watchdog is unavailable
+TARGET_RELOAD_SECONDS = 30.0  # how often roots/shards are re-read for newly indexed roots
+
+
+class _ChangeTracker:
+    """Collects filesystem events into a set of dirty directories.
+
+    Passed straight to the watchdog observer, which only needs `dispatch`.
+    """
+
+    def __init__(self, ignore_prefixes):
+        self._lock = threading.Lock()
+        self._ignore_prefixes = ignore_prefixes
+        self._dirty = set()
+        self._moves = []
+        self._first_event = None
+        self._last_event = None
+
+    def dispatch(self, event):
+        src = getattr(event, "src_path", "")
+        if not src or src.startswith(self._ignore_prefixes):
+            return
+
+        with self._lock:
+            if event.event_type == "moved":
+                self._moves.append((src, event.dest_path))
+                self._dirty.add(os.path.dirname(src))
+                self._dirty.add(os.path.dirname(event.dest_path))
+            elif event.event_type == "modified" and event.is_directory:
+                self._dirty.add(src)
+            elif event.event_type in {"created", "deleted", "modified", "closed"}:
+                self._dirty.add(os.path.dirname(src))
+            else:
+                return
+
+            now = time.time()
+            self._last_event = now
+            if self._first_event is None:
+                self._first_event = now
+
+    def take_ready(self):
+        """Return (moves, dirty_dirs) once the current burst has settled."""
+        with self._lock:
+            if self._first_event is None:
+                return [], set()
+
+            now = time.time()
+            settled = now - self._last_event >= DEBOUNCE_SECONDS
+            overdue = now - self._first_event >= MAX_DELAY_SECONDS
+            if not (settled or overdue):
+                return [], set()
+
+            moves, dirty = self._moves, self._dirty
+            self._moves, self._dirty = [], set()
+            self._first_event = self._last_event = None
+            return moves, dirty
+
+    def put_back(self, moves, dirty):
+        """Queue changes that couldn't be written again, ahead of newer ones."""
+        with self._lock:
+            self._moves = list(moves) + self._moves
+            self._dirty |= set(dirty)
+            now = time.time()
+            self._last_event = now
+            if self._first_event is None:
+                self._first_event = now
+
+
+def _load_targets():
+    """(root, db path) for every root indexed in files.db or one of its shards."""
+    targets = []
+    for db_path in index_databases(DB_PATH):
+        if not os.path.exists(db_path):
+            continue
+        conn = sqlite3.connect(db_path)
+        try:
+            rows = conn.execute("SELECT path FROM roots").fetchall()
+        except sqlite3.OperationalError:
+            rows = []
+        finally:
+            conn.close()
+        targets.extend((root, db_path) for (root,) in rows if os.path.isdir(root))
+    return targets
+
+
+def _owner(targets, path):
+    """DB of the deepest indexed root containing `path`, or None."""
+    best_root, best_db = "", None
+    for root, db_path in targets:
+        prefix = root if root.endswith(os.sep) else root + os.sep
+        if (path == root or path.startswith(prefix)) and len(root) > len(best_root):
+            best_root, best_db = root, db_path
+    return best_db
+
+
+def _apply_changes(conn, moves, dirty):
+    cursor = conn.cursor()
+
+    for src, dest in moves:
+        move_path(cursor, src, dest)
+    conn.commit()
+
+    # Parents are listed before children; new subtrees (an unpacked archive,
+    # a copied folder) are walked right away and listed only once.
+    stack = sorted(dirty, reverse=True)
+    listed = set()
+    changed = 0
+    deleted = 0
+
+    while stack:
+        path = stack.pop()
+        if path in listed:
+            continue
+        listed.add(path)
+
+        try:
+            _, new_subdirs, dir_changed, dir_deleted = refresh_directory(cursor, path)
+        except OSError:
+            continue  # gone again; its parent's listing drops the rows
+
+        changed += dir_changed
+        deleted += dir_deleted
+        stack.extend(new_subdirs)
+
+        if len(listed) % DIRS_PER_TRANSACTION == 0:
+            conn.commit()
+
+    conn.commit()
+    return len(listed), changed, deleted
+
+
+def _poll_loop(stop_event):
+    next_refresh = time.time() + POLL_INTERVAL
+    while not (stop_event is not None and stop_event.is_set()):
+        if time.time() >= next_refresh:
+            for root, db_path in _load_targets():
+                refresh_index(root, db_path)
+            next_refresh = time.time() + POLL_INTERVAL
+        time.sleep(0.5)
+
+
+def _sync_targets(observer, tracker, watches, conns, current):
+    """Watch roots indexed (or sharded) since the last call; returns the new targets."""
+    targets = _load_targets()
+    if targets == current:
+        return current
+
+    roots = {root for root, _ in targets}
+    for root in watches.keys() - roots:
+        observer.unschedule(watches.pop(root))
+    for root in sorted(roots - watches.keys()):
+        watches[root] = observer.schedule(tracker, root, recursive=True)
+    for _, db_path in targets:
+        if db_path not in conns:
+            conns[db_path] = connect(db_path, timeout=30)
+
+    if targets:
+        print(f"[WATCHER] Watching {len(targets)} root(s): {', '.join(root for root, _ in targets)}")
+    else:
+        print("[WATCHER] No indexed roots yet; waiting for the crawler.")
+    return targets
+
+
+def watcher_worker(stop_event=None):
+    print("[WATCHER] Started.")
+
+    try:
+        from watchdog.observers import Observer
+    except Exception as e:
+        print(f"[WATCHER WARNING] watchdog unavailable ({e}); polling every {POLL_INTERVAL:.0f}s.")
+        _poll_loop(stop_event)
+        print("[WATCHER] Stopped.")
+        return
+
+    # Writes to the DBs themselves (and their journals) must not feed back in.
+    shard_dir = os.path.join(os.path.dirname(os.path.abspath(DB_PATH)), SHARD_DIR)
+    tracker = _ChangeTracker(ignore_prefixes=(os.path.abspath(DB_PATH), shard_dir))
+    observer = Observer()
+    observer.start()
+
+    # Roots and shards are re-read periodically, so a first crawl or a new
+    # shard is picked up without restarting the pipeline.
+    watches = {}    # root -> watchdog watch
+    conns = {}      # db path -> connection
+    targets = None
+    next_reload = 0.0
+
+    try:
+        while not (stop_event is not None and stop_event.is_set()):
+            if time.time() >= next_reload:
+                targets = _sync_targets(observer, tracker, watches, conns, targets)
+                next_reload = time.time() + TARGET_RELOAD_SECONDS
+
+            time.sleep(0.2)
+            moves, dirty = tracker.take_ready()
+            if not (moves or dirty):
+                continue
+
+            start = time.time()
+            listed = changed = deleted = 0
+            for db_path, conn in conns.items():
+                # A move into another DB (or out of every root) is left to the
+                # re-listing of both parents: a delete here, a new entry there.
+                db_moves = [m for m in moves if _owner(targets, m[0]) == db_path == _owner(targets, m[1])]
+                db_dirty = {d for d in dirty if _owner(targets, d) == db_path}
+                if not (db_moves or db_dirty):
+                    continue
+                try:
+                    counts = _apply_changes(conn, db_moves, db_dirty)
+                except sqlite3.Error as e:
+                    # Locked by a bulk swap or a long crawl commit, usually;
+                    # re-applying the part already committed is harmless.
+                    conn.rollback()
+                    tracker.put_back(db_moves, db_dirty)
+                    print(f"[WATCHER WARNING] Could not update {db_path} ({e}); "
+                          f"retrying {len(db_moves)} moves and {len(db_dirty)} directories.")
+                    continue
+                listed += counts[0]
+                changed += counts[1]
+                deleted += counts[2]
+
+            print(f"[WATCHER] {len(moves)} moves, {listed} directories re-listed, "
+                  f"{changed} added/updated, {deleted} removed in {time.time() - start:.2f}s")
+    finally:
+        observer.stop()
+        observer.join(timeout=3)
+        for conn in conns.values():
+            conn.close()
+
+    print("[WATCHER] Stopped.")
@@ -0,0 +1,623 @@
+# name_index.py
+# In-memory lookup structures over indexed names, shared by new_arch.py and
+# the mic resolver so neither has to scan every name per query.
+#
+# Names are interned once in a NameTable and the indexes refer to them by
+# id, keeping their postings in sorted integer arrays rather than sets of
+# Python objects. Each structure can be flattened to a few arrays
+# (to_arrays) and run over saved ones, e.g. views of a memory-mapped
+# snapshot; changes made after that are kept on the side.
+import math
+from array import array
+from bisect import bisect_left, insort
+from collections import Counter
+from difflib import SequenceMatcher
+from itertools import accumulate
+
+# A strict pass catches names within TYPO_EDITS slipped letters cheaply (each
+# edit breaks at most 3 trigrams); a loose one only bounds length by what can
+# still reach the cutoff ratio.
+TYPO_EDITS = 2
+STRICT_OVERLAP = 0.6       # share of the query's trigrams needed in each pass
+LOOSE_OVERLAP = 0.3
+MAX_CANDIDATES = 64        # candidates scored with SequenceMatcher per query
+PREFILTER_FACTOR = 4       # names per candidate slot checked against every trigram
+
+MAX_EDITS = 2              # misheard letters the edit index still corrects
+PREFIX_LENGTH = 7          # leading/trailing characters the edit index files deletes for
+
+ID_TYPE = "I"              # array typecode for name ids (4 bytes each)
+
+
+def trigrams(text):
+    """Character trigrams of `text`, padded so short names and word edges count."""
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_budget(query):
+    """Edits worth allowing for `query`: none under four letters, two from eight."""
+    return min(MAX_EDITS, len(query) // 4)
+
+
+def edit_distance(a, b, limit):
+    """Optimal string alignment distance (an adjacent swap is one edit).
+
+    Returns `limit + 1` as soon as the distance must exceed `limit`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+
+    # Shared ends cost nothing; near misses are mostly shared ends.
+    start = 0
+    while start < len(a) and start < len(b) and a[start] == b[start]:
+        start += 1
+    end = 0
+    while end < len(a) - start and end < len(b) - start and a[-1 - end] == b[-1 - end]:
+        end += 1
+    a, b = a[start:len(a) - end], b[start:len(b) - end]
+    if not a or not b:
+        return len(a) + len(b) if len(a) + len(b) <= limit else limit + 1
+
+    # Cells more than `limit` off the diagonal can't come back under it, so
+    # only the band around it is filled; the rest stay at `over`.
+    over = limit + 1
+    before = None
+    previous = [min(j, over) for j in range(len(b) + 1)]
+    for i in range(1, len(a) + 1):
+        current = [over] * (len(b) + 1)
+        if i <= limit:
+            current[0] = i
+        low, high = max(1, i - limit), min(len(b), i + limit)
+        for j in range(low, high + 1):
+            cost = a[i - 1] != b[j - 1]
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, before[j - 2] + 1)
+            current[j] = value
+        if min(current[low - 1:high + 1]) > limit:
+            return over
+        before, previous = previous, current
+
+    return previous[-1] if previous[-1] <= limit else over
+
+
+def _end_length(length):
+    """Characters at each end of a `length`-long name that EditIndex files deletes for.
+
+    The two ends stay at least two characters apart, so no single edit (a
+    swap included) touches both.
+    """
+    return max(0, min(PREFIX_LENGTH, (length - 2) // 2))
+
+
+def _deletes(word, edits):
+    """`word` and every string reachable from it by up to `edits` deletions."""
+    found = {word}
+    frontier = {word}
+    for _ in range(edits):
+        frontier = {w[:i] + w[i + 1:] for w in frontier for i in range(len(w))}
+        found |= frontier
+    return found
+
+
+def _has_id(ids, name_id):
+    """Membership test on a sorted id array."""
+    i = bisect_left(ids, name_id)
+    return i < len(ids) and ids[i] == name_id
+
+
+def _drop_id(ids, name_id):
+    i = bisect_left(ids, name_id)
+    if i < len(ids) and ids[i] == name_id:
+        del ids[i]
+
+
+def _copy_ids(ids):
+    """Writable copy of a (possibly read-only, saved) id array."""
+    copy = array(ID_TYPE)
+    copy.frombytes(memoryview(ids).cast("B"))
+    return copy
+
+
+def _nbytes(ids):
+    return ids.itemsize * len(ids)
+
+
+def closest(query, names, cutoff=0.6):
+    """(score, name) of the closest of `names` by a plain scan, or (0.0, None).
+
+    For sets small enough to scan, e.g. one directory's subtree. Scored the
+    way EditIndex and TrigramIndex score, so results compare with theirs.
+    """
+    budget = edit_budget(query)
+    near = [(edit_distance(query, name, budget), name) for name in names]
+    fewest = min((distance for distance, _ in near), default=budget + 1)
+    if fewest <= budget:
+        return max((SequenceMatcher(None, query, name).ratio(), name)
+                   for distance, name in near if distance == fewest)
+
+    best_score, best_name = 0.0, None
+    matcher = SequenceMatcher()
+    matcher.set_seq2(query)
+    for name in names:
+        matcher.set_seq1(name)
+        bar = max(cutoff, best_score)
+        if matcher.real_quick_ratio() < bar or matcher.quick_ratio() < bar:
+            continue
+        score = matcher.ratio()
+        if score >= cutoff and score > best_score:
+            best_score, best_name = score, name
+    return best_score, best_name
+
+
+class NameTable:
+    """Interned names: one UTF-8 buffer plus offsets, sorted so lookups bisect.
+
+    A name's id is its position. Names added later get ids past the sorted
+    ones and removed names are only marked, so ids handed out stay valid
+    for the life of the table.
+
+    The buffer and offsets may be any bytes-like object and sequence of
+    ints (see from_arrays), so a table can sit directly on a mapped file.
+    """
+
+    def __init__(self, names=()):
+        encoded = sorted({name.encode("utf-8") for name in names})
+        self._buffer = b"".join(encoded)
+        self._offsets = array("Q", accumulate(map(len, encoded), initial=0))
+        self._sorted = len(encoded)
+        self._added = []       # names interned after the build
+        self._added_ids = {}
+        self._removed = set()
+
+    @classmethod
+    def from_arrays(cls, buffer, offsets):
+        """Table over a buffer and offsets saved from to_arrays()."""
+        table = cls()
+        table._buffer, table._offsets, table._sorted = buffer, offsets, len(offsets) - 1
+        return table
+
+    def to_arrays(self):
+        """(buffer, offsets) of a table that hasn't changed since it was built."""
+        if self._added or self._removed:
+            raise ValueError("only an unchanged NameTable can be saved")
+        return self._buffer, self._offsets
+
+    def __len__(self):
+        """Ids handed out so far, removed names included."""
+        return self._sorted + len(self._added)
+
+    def __getitem__(self, name_id):
+        if name_id < self._sorted:
+            return str(self._buffer[self._offsets[name_id]:self._offsets[name_id + 1]], "utf-8")
+        return self._added[name_id - self._sorted]
+
+    def nbytes(self):
+        return len(self._buffer) + _nbytes(self._offsets)
+
+    def live_ids(self):
+        removed = self._removed
+        return (name_id for name_id in range(len(self)) if name_id not in removed)
+
+    def _bytes(self, name_id):
+        return bytes(self._buffer[self._offsets[name_id]:self._offsets[name_id + 1]])
+
+    def _bisect(self, key):
+        """First sorted id whose UTF-8 name is not below `key`."""
+        lo, hi = 0, self._sorted
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._bytes(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _find(self, name):
+        name_id = self._added_ids.get(name)
+        if name_id is not None:
+            return name_id
+
+        key = name.encode("utf-8")
+        lo = self._bisect(key)
+        if lo < self._sorted and self._bytes(lo) == key:
+            return lo
+        return None
+
+    def with_prefix(self, prefix, limit):
+        """Ids of up to `limit` live names starting with `prefix`, in name order."""
+        # UTF-8 keeps code point order, so the matches form one run of the sorted ids.
+        key = prefix.encode("utf-8")
+        found = []
+        name_id = self._bisect(key)
+        while name_id < self._sorted and len(found) < limit and self._bytes(name_id).startswith(key):
+            if name_id not in self._removed:
+                found.append(name_id)
+            name_id += 1
+        found.extend(name_id for name_id in self._added_ids.values()
+                     if name_id not in self._removed and self[name_id].startswith(prefix))
+        found.sort(key=self.__getitem__)
+        return found[:limit]
+
+    def index(self, name):
+        """Id of `name`, or None if it isn't in the table."""
+        name_id = self._find(name)
+        if name_id is None or name_id in self._removed:
+            return None
+        return name_id
+
+    def add(self, name):
+        """Id of `name`, interning it first if needed."""
+        name_id = self._find(name)
+        if name_id is not None:
+            self._removed.discard(name_id)
+            return name_id
+        name_id = len(self)
+        self._added.append(name)
+        self._added_ids[name] = name_id
+        return name_id
+
+    def remove(self, name_id):
+        self._removed.add(name_id)
+
+
+class TrigramIndex:
+    """Trigram -> name ids inverted index for fuzzy name lookup.
+
+    Postings are split by name length, so a query only touches names whose
+    length could still match. Within that window it counts the posting lists
+    of its rarest trigrams only: any name sharing at least `min_shared` of
+    the query's n trigrams must contain one of its n - min_shared + 1 rarest
+    ones. The names with the most rare hits are checked against the rest,
+    and only the best MAX_CANDIDATES are scored exactly.
+
+    Built over saved arrays, `postings` only holds the trigrams changed
+    since; an empty entry hides a saved one.
+    """
+
+    def __init__(self, table, arrays=None):
+        self.table = table
+        self.postings = {}     # trigram -> {name length -> sorted id array}
+        self._saved = None
+        if arrays is None:
+            self._build()
+        else:
+            self._saved = (NameTable.from_arrays(arrays["grams"], arrays["gram_offsets"]),
+                           arrays["gram_starts"], arrays["lengths"], arrays["length_starts"],
+                           arrays["ids"])
+
+    def _build(self):
+        # Live ids come in ascending order, so appending keeps every list sorted.
+        lists = {}
+        table = self.table
+        for name_id in table.live_ids():
+            name = table[name_id]
+            length = len(name)
+            padded = f"  {name} "
+            for i in range(len(padded) - 2):
+                by_length = lists.get(padded[i:i + 3])
+                if by_length is None:
+                    by_length = lists[padded[i:i + 3]] = {}
+                posting = by_length.get(length)
+                if posting is None:
+                    by_length[length] = [name_id]
+                else:
+                    posting.append(name_id)
+
+        for gram, by_length in lists.items():
+            self.postings[gram] = {length: array(ID_TYPE, ids) for length, ids in by_length.items()}
+
+    def to_arrays(self):
+        """The postings as flat arrays: grams (as a NameTable), their lengths and ids."""
+        if self._saved is not None:
+            raise ValueError("a TrigramIndex over saved arrays can't be saved again")
+        grams = NameTable(gram for gram, by_length in self.postings.items() if by_length)
+        gram_starts, lengths = array("Q", [0]), array("I")
+        length_starts, ids = array("Q", [0]), array(ID_TYPE)
+        for i in range(len(grams)):
+            by_length = self.postings[grams[i]]
+            for length in sorted(by_length):
+                lengths.append(length)
+                ids.extend(by_length[length])
+                length_starts.append(len(ids))
+            gram_starts.append(len(lengths))
+        buffer, offsets = grams.to_arrays()
+        return {"grams": buffer, "gram_offsets": offsets, "gram_starts": gram_starts,
+                "lengths": lengths, "length_starts": length_starts, "ids": ids}
+
+    def nbytes(self):
+        size = sum(_nbytes(posting) for by_length in self.postings.values() for posting in by_length.values())
+        if self._saved is not None:
+            grams, *arrays = self._saved
+            size += grams.nbytes() + sum(map(_nbytes, arrays))
+        return size
+
+    def _by_length(self, gram):
+        """{name length: ids} for `gram`, or None."""
+        by_length = self.postings.get(gram)
+        if by_length is not None or self._saved is None:
+            return by_length
+        grams, gram_starts, lengths, length_starts, ids = self._saved
+        i = grams.index(gram)
+        if i is None:
+            return None
+        return {lengths[j]: ids[length_starts[j]:length_starts[j + 1]]
+                for j in range(gram_starts[i], gram_starts[i + 1])}
+
+    def _editable(self, gram):
+        by_length = self.postings.get(gram)
+        if by_length is None:
+            saved = self._by_length(gram) or {}
+            by_length = self.postings[gram] = {n: _copy_ids(ids) for n, ids in saved.items()}
+        return by_length
+
+    def add(self, name_id):
+        name = self.table[name_id]
+        length = len(name)
+        for gram in trigrams(name):
+            by_length = self._editable(gram)
+            posting = by_length.get(length)
+            if posting is None:
+                by_length[length] = array(ID_TYPE, [name_id])
+            elif not _has_id(posting, name_id):
+                insort(posting, name_id)
+
+    def remove(self, name_id):
+        name = self.table[name_id]
+        length = len(name)
+        for gram in trigrams(name):
+            by_length = self._editable(gram)
+            posting = by_length.get(length)
+            if posting is None:
+                continue
+            _drop_id(posting, name_id)
+            if not posting:
+                del by_length[length]
+                if not by_length and self._saved is None:
+                    del self.postings[gram]
+
+    def candidates(self, query, min_shared, lengths, limit=MAX_CANDIDATES):
+        """Names with a length in `lengths` sharing at least `min_shared` of `query`'s trigrams."""
+        grams = trigrams(query)
+        found, lists = {}, {}
+        for gram in grams:
+            by_length = found[gram] = self._by_length(gram)
+            if by_length:
+                postings = [by_length[n] for n in lengths if n in by_length]
+                if postings:
+                    lists[gram] = postings
+        if len(lists) < min_shared:
+            return []
+
+        present = sorted(lists, key=lambda g: sum(map(len, lists[g])))
+        split = len(present) - min_shared + 1
+        counts = Counter()
+        for gram in present[:split]:
+            for posting in lists[gram]:
+                counts.update(posting)
+
+        # Hits on the rare trigrams are the telling ones; only the names with
+        # the most of those are checked against the common ones too.
+        table = self.table
+        rest = [found[gram] for gram in present[split:]]
+        shared = Counter()
+        for name_id, count in counts.most_common(limit * PREFILTER_FACTOR):
+            length = len(table[name_id])
+            count += sum(1 for by_length in rest
+                         if length in by_length and _has_id(by_length[length], name_id))
+            if count >= min_shared:
+                shared[name_id] = count
+
+        return [table[name_id] for name_id, _ in shared.most_common(limit)]
+
+    def best_match(self, query, cutoff=0.6):
+        """(score, name) of the closest name by SequenceMatcher ratio, or (0.0, None)."""
+        size = len(query)
+        grams = len(trigrams(query))
+        # ratio = 2 * matches / (len(a) + len(b)) caps how far lengths can differ.
+        bound_lo = math.ceil(size * cutoff / (2 - cutoff))
+        bound_hi = math.floor(size * (2 - cutoff) / cutoff)
+        tiers = (
+            (max(grams - 3 * TYPO_EDITS, round(grams * STRICT_OVERLAP)),
+             range(max(bound_lo, size - TYPO_EDITS), min(bound_hi, size + TYPO_EDITS) + 1)),
+            (max(1, round(grams * LOOSE_OVERLAP)), range(bound_lo, bound_hi + 1)),
+        )
+
+        matcher = SequenceMatcher()
+        matcher.set_seq2(query)
+        for min_shared, lengths in tiers:
+            best_score, best_name = 0.0, None
+            for name in self.candidates(query, min_shared, lengths):
+                matcher.set_seq1(name)
+                bar = max(cutoff, best_score)
+                if matcher.real_quick_ratio() < bar or matcher.quick_ratio() < bar:
+                    continue
+                score = matcher.ratio()
+                if score >= cutoff and score > best_score:
+                    best_score, best_name = score, name
+            if best_name is not None:
+                return best_score, best_name
+        return 0.0, None
+
+
+class EditIndex:
+    """Symmetric-delete (SymSpell) index for names within a few edits.
+
+    Every name is filed under the strings its first few characters (see
+    _end_length) turn into after up to MAX_EDITS - 1 deletions, likewise its
+    last ones, and under the rest of the name past either end. A query
+    within k edits of a name either leaves neither end with all k, so the
+    two share a delete at both ends, or puts them all in one end, so the
+    rest of the name is an exact prefix or suffix of the query. The query
+    intersects the names filed under its head and tail deletes, adds those
+    filed under its own prefixes and suffixes, and checks the few that are
+    left with edit_distance. Checking both ends keeps common leading words
+    ("IMG_", "report_") from flooding the candidates, and filing one delete
+    fewer per end keeps a name's keys to 2 * PREFIX_LENGTH + 4. Adding or
+    removing a name touches only its own keys.
+
+    Built over saved arrays, `deletes` only holds the keys changed since; an
+    empty array hides a saved key.
+    """
+
+    def __init__(self, table, arrays=None):
+        self.table = table
+        self.deletes = {}      # delete string -> id, or sorted id array once shared
+        self._saved = None
+        if arrays is None:
+            self._build()
+        else:
+            self._saved = (NameTable.from_arrays(arrays["keys"], arrays["key_offsets"]),
+                           arrays["key_starts"], arrays["ids"])
+
+    @staticmethod
+    def _keys(name):
+        end = _end_length(len(name))
+        keys = _deletes(name[:end], MAX_EDITS - 1)
+        # Other keys are marked so "abc" at the start and at the end don't mix.
+        keys.update("\0" + key for key in _deletes(name[len(name) - end:], MAX_EDITS - 1))
+        keys.add("\1" + name[end + 1:])
+        keys.add("\2" + name[:len(name) - end - 1])
+        return keys
+
+    def _build(self):
+        deletes = self.deletes
+        table = self.table
+        for name_id in table.live_ids():
+            for key in self._keys(table[name_id]):
+                entry = deletes.get(key)
+                if entry is None:
+                    deletes[key] = name_id     # most keys belong to a single name
+                elif isinstance(entry, list):
+                    entry.append(name_id)
+                else:
+                    deletes[key] = [entry, name_id]
+
+        for key, entry in deletes.items():
+            if isinstance(entry, list):
+                deletes[key] = array(ID_TYPE, entry)
+
+    def to_arrays(self):
+        """The delete keys (as a NameTable) and the ids filed under each, as flat arrays."""
+        if self._saved is not None:
+            raise ValueError("an EditIndex over saved arrays can't be saved again")
+        keys = NameTable(self.deletes)
+        key_starts, ids = array("Q", [0]), array(ID_TYPE)
+        for i in range(len(keys)):
+            entry = self.deletes[keys[i]]
+            if isinstance(entry, int):
+                ids.append(entry)
+            else:
+                ids.extend(entry)
+            key_starts.append(len(ids))
+        buffer, offsets = keys.to_arrays()
+        return {"keys": buffer, "key_offsets": offsets, "key_starts": key_starts, "ids": ids}
+
+    def nbytes(self):
+        size = sum(_nbytes(entry) for entry in self.deletes.values() if not isinstance(entry, int))
+        if self._saved is not None:
+            keys, *arrays = self._saved
+            size += keys.nbytes() + sum(map(_nbytes, arrays))
+        return size
+
+    def _entry(self, key):
+        """Id or sorted ids filed under `key`, or None."""
+        entry = self.deletes.get(key)
+        if entry is not None or self._saved is None:
+            return entry
+        keys, key_starts, ids = self._saved
+        i = keys.index(key)
+        if i is None:
+            return None
+        saved = ids[key_starts[i]:key_starts[i + 1]]
+        return saved[0] if len(saved) == 1 else saved
+
+    def add(self, name_id):
+        deletes = self.deletes
+        for key in self._keys(self.table[name_id]):
+            entry = self._entry(key)
+            if entry is None or (not isinstance(entry, int) and not entry):
+                deletes[key] = name_id
+            elif isinstance(entry, int):
+                if entry != name_id:
+                    deletes[key] = array(ID_TYPE, sorted((entry, name_id)))
+            elif not _has_id(entry, name_id):
+                if key not in deletes:
+                    entry = deletes[key] = _copy_ids(entry)
+                insort(entry, name_id)
+
+    def remove(self, name_id):
+        deletes = self.deletes
+        for key in self._keys(self.table[name_id]):
+            entry = self._entry(key)
+            if entry is None:
+                continue
+            if isinstance(entry, int):
+                if entry == name_id:
+                    if self._saved is None:
+                        del deletes[key]
+                    else:
+                        deletes[key] = array(ID_TYPE)
+            elif _has_id(entry, name_id):
+                if key not in deletes:
+                    entry = deletes[key] = _copy_ids(entry)
+                _drop_id(entry, name_id)
+                if len(entry) == 1:
+                    deletes[key] = entry[0]
+
+    def _filed_under(self, keys):
+        found = set()
+        for key in keys:
+            entry = self._entry(key)
+            if entry is None:
+                continue
+            if isinstance(entry, int):
+                found.add(entry)
+            else:
+                found.update(entry)
+        return found
+
+    def lookup(self, query, max_edits=None):
+        """[(distance, name)] for every name within `max_edits` of `query`, closest first."""
+        if max_edits is None:
+            max_edits = edit_budget(query)
+        max_edits = min(max_edits, MAX_EDITS)
+
+        # Names within max_edits are this many characters long, and file
+        # their ends and rests by that length.
+        lengths = range(max(0, len(query) - max_edits), len(query) + max_edits + 1)
+        depth = max(0, max_edits - 1)
+        candidates = set()
+        for end in {_end_length(length) for length in lengths}:
+            heads = self._filed_under(_deletes(query[:end], depth))
+            if heads:
+                tails = _deletes(query[len(query) - end:], depth)
+                candidates |= heads & self._filed_under("\0" + key for key in tails)
+        for length in lengths:
+            rest = length - _end_length(length) - 1
+            if 0 <= rest <= len(query):
+                candidates |= self._filed_under(("\1" + query[len(query) - rest:], "\2" + query[:rest]))
+
+        found = []
+        for name_id in candidates:
+            name = self.table[name_id]
+            distance = edit_distance(query, name, max_edits)
+            if distance <= max_edits:
+                found.append((distance, name))
+
+        found.sort()
+        return found
+
+    def best_match(self, query):
+        """(score, name) for the closest name within edit_budget(query), or (0.0, None).
+
+        The fewest edits wins; SequenceMatcher breaks ties and gives the
+        score, so results compare with TrigramIndex.best_match.
+        """
+        found = self.lookup(query)
+        if not found:
+            return 0.0, None
+        fewest = found[0][0]
+        return max((SequenceMatcher(None, query, name).ratio(), name)
+                   for distance, name in found if distance == fewest)
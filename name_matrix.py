@@ -0,0 +1,144 @@
+# name_matrix.py
+# Full-scan fuzzy scoring over indexed names with NumPy, for when the
+# trigram and edit indexes can't narrow a query down (very short queries,
+# names unlike anything in the posting lists).
+#
+# Names are encoded as fixed-width matrices of small integer character
+# codes, one row per name. Bucketing them by length keeps every row of a
+# matrix full, so no padding is scanned and the length bound of the cutoff
+# skips whole buckets. A query is scored against every row of a bucket at
+# once with Myers' bit-parallel edit distance: the query's characters are bits of a
+# uint64 word, so each name column costs a dozen array operations however
+# many names the bucket holds.
+import numpy as np
+
+ONE = np.uint64(1)
+MAX_QUERY = 64             # query characters that fit the uint64 bit vectors
+CHUNK_ROWS = 65536         # rows per matrix chunk; later additions get their own
+
+
+def similarity(distance, query_length, name_length):
+    """1.0 for equal strings, 0.0 when every character had to change."""
+    return 1.0 - distance / max(query_length, name_length, 1)
+
+
+class NameMatrix:
+    """Length-bucketed code matrices over the live names of a NameTable.
+
+    `buckets[length]` holds chunks of (codes, ids): codes is an
+    (n, length) matrix, ids the name id of each row. Names added later are
+    queued and encoded into a new chunk the next time their bucket is
+    scored; removed ids are masked out of the results.
+    """
+
+    def __init__(self, table):
+        self.table = table
+        self.alphabet = {}       # character -> code; 0 is never assigned
+        self.buckets = {}        # length -> [(codes, ids)]
+        self._pending = {}       # length -> [name id] not encoded yet
+        self._removed = set()
+        self._build()
+
+    def _build(self):
+        grouped, names = {}, []
+        for name_id in self.table.live_ids():
+            name = self.table[name_id]
+            if name:
+                grouped.setdefault(len(name), []).append(name_id)
+                names.append(name)
+
+        points = np.frombuffer("".join(names).encode("utf-32-le"), dtype=np.uint32)
+        self.alphabet = {chr(c): code for code, c in enumerate(np.unique(points).tolist(), 1)}
+        del names, points
+        for length, ids in grouped.items():
+            for start in range(0, len(ids), CHUNK_ROWS):
+                self._encode(length, ids[start:start + CHUNK_ROWS])
+
+    def _code_type(self):
+        return np.uint16 if len(self.alphabet) < 2**16 else np.uint32
+
+    def _encode(self, length, ids):
+        text = "".join(self.table[name_id] for name_id in ids)
+        for c in set(text) - self.alphabet.keys():
+            self.alphabet[c] = len(self.alphabet) + 1
+        points = np.frombuffer(text.encode("utf-32-le"), dtype=np.uint32)
+        # Map code points to codes through a sorted lookup of the alphabet.
+        keys = np.array([ord(c) for c in self.alphabet], dtype=np.uint32)
+        values = np.array(list(self.alphabet.values()), dtype=self._code_type())
+        order = np.argsort(keys)
+        codes = values[order][np.searchsorted(keys[order], points)]
+        self.buckets.setdefault(length, []).append(
+            (codes.reshape(len(ids), length), np.array(ids, dtype=np.int64)))
+
+    def nbytes(self):
+        return sum(codes.nbytes + ids.nbytes for chunks in self.buckets.values() for codes, ids in chunks)
+
+    def add(self, name_id):
+        if name_id in self._removed:
+            self._removed.discard(name_id)   # its row is still there
+            return
+        name = self.table[name_id]
+        if name:
+            self._pending.setdefault(len(name), []).append(name_id)
+
+    def remove(self, name_id):
+        self._removed.add(name_id)
+
+    def _chunks(self, length):
+        pending = self._pending.pop(length, None)
+        if pending:
+            self._encode(length, pending)
+        return self.buckets.get(length, ())
+
+    def distances(self, query, codes):
+        """Levenshtein distance from `query` to every row of `codes`."""
+        size = len(query)
+        peq = np.zeros(len(self.alphabet) + 1, dtype=np.uint64)
+        for i, c in enumerate(query):
+            code = self.alphabet.get(c)
+            if code is not None:
+                peq[code] |= ONE << np.uint64(i)
+
+        rows = len(codes)
+        high = ONE << np.uint64(size - 1)
+        pv = np.full(rows, ~np.uint64(0), dtype=np.uint64)
+        mv = np.zeros(rows, dtype=np.uint64)
+        score = np.full(rows, size, dtype=np.int32)
+        for column in codes.T:
+            eq = peq[column]
+            xv = eq | mv
+            xh = (((eq & pv) + pv) ^ pv) | eq
+            ph = mv | ~(xh | pv)
+            mh = pv & xh
+            score += (ph & high) != 0
+            score -= (mh & high) != 0
+            ph = (ph << ONE) | ONE
+            mh = mh << ONE
+            pv = mh | ~(xv | ph)
+            mv = ph & xv
+        return score
+
+    def best_match(self, query, cutoff=0.6):
+        """(score, name) of the most similar name by edit distance, or (0.0, None)."""
+        size = len(query)
+        if not size or size > MAX_QUERY:
+            return 0.0, None
+
+        # similarity >= cutoff bounds the length difference.
+        lengths = range(max(1, int(np.ceil(size * cutoff))), int(size / cutoff) + 1)
+        best_score, best_id = 0.0, None
+        for length in lengths:
+            # The distance is at least the length difference.
+            if similarity(abs(length - size), size, length) < max(cutoff, best_score):
+                continue
+            for codes, ids in self._chunks(length):
+                scores = self.distances(query, codes)
+                if self._removed:
+                    scores = np.where(np.isin(ids, list(self._removed)), size + length, scores)
+                row = int(np.argmin(scores))
+                score = similarity(int(scores[row]), size, length)
+                if score >= cutoff and score > best_score:
+                    best_score, best_id = score, int(ids[row])
+        if best_id is None:
+            return 0.0, None
+        return best_score, self.table[best_id]
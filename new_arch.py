@@ -7,13 +7,16 @@ import torch
 import numpy as np
 import keyboard
 import ollama
-import shutil, os
-import sqlite3
+import shutil, os, threading
+from crawler import indexed_size, list_directory
+from bulk_ops import bulk_targets, parse_bulk, preview, run_bulk, summarize
+from file_query import split_scope
+from resolver import DbPathResolver
 
-conn = sqlite3.connect("files.db")
-cursor = conn.cursor()
-files = cursor.execute("SELECT name, path FROM files").fetchall()
-directories = cursor.execute("SELECT name, path FROM directories").fetchall()
+# Same lookups as the mic executor, mapped from the files.db snapshot, so
+# running both doesn't hold two copies of every name.
+RESOLVER_ENGINE = "index"  # "numpy" scans every name per fuzzy lookup instead (see name_matrix.py)
+resolver = DbPathResolver("files.db", engine=RESOLVER_ENGINE)
 
 MODEL = "llama3:8b-instruct-q4_0"  # Ollama model name
 
@@ -30,6 +33,7 @@ ALLOWED_ACTIONS = [
     "type_text",
     "rename",
     "move",
+    "bulk",
 ]
 
 SAMPLERATE = 16000   # Whisper native rate
@@ -42,31 +46,59 @@ def get_close_action(word, target):
     matches = get_close_matches(word, target, n=1, cutoff=0.6)
     return matches[0] if matches else None
 
-def get_close_file_or_dir(name):
+def get_close_file_or_dir(name, scope=None):
+    """Indexed paths matching `name`, only below the directory `scope` names if given."""
     if not name:
         return None
-    all_names = [f[0].lower() for f in files] + [d[0].lower() for d in directories]
-    matches = get_close_matches(name.lower(), all_names, n=1, cutoff=0.6)
-    if not matches:
-        return None
-    out = []
-    match = matches[0]
-    for f in files:
-        if f[0].lower() == match:
-            out.append(f[1])
-    for d in directories:
-        if d[0].lower() == match:
-            out.append(d[1])
-    return out if out else None
+    return resolver.resolve(name, scope=scope) or None
+
+MORE_WORDS = {"more", "next", "next page"}
+_listing = {"path": None, "offset": 0}  # last directory listed, for "more"
+
+VERIFY_SIZES = False  # also re-walk directories in the background after answering from the index
+
+def _walk_size(path):
+    return sum(
+        os.path.getsize(os.path.join(dp, f))
+        for dp, _, fnames in os.walk(path)
+        for f in fnames
+    )
+
+def _verify_size(path, indexed):
+    """Re-walk `path` off the main thread and report if the index was off."""
+    try:
+        total = _walk_size(path)
+    except OSError as e:
+        print(f"[SIZE] Could not verify '{path}': {e}")
+        return
+    if total == indexed:
+        print(f"[SIZE] Verified '{path}': {total} bytes")
+    else:
+        print(f"[SIZE] '{path}' is {total} bytes on disk; the index said {indexed}. "
+              f"A refresh of the index will catch up.")
+
+def _forget_path(path):
+    """Drop a deleted path (and anything under it) from files.db and the lookups."""
+    resolver.forget(path)
+
+def _move_path(src, dest):
+    """Re-point files.db and the lookups from src to dest after a rename/move."""
+    resolver.moved(src, dest)
 
 def check_files_and_directories(value, chooser=None):
     """Look up value in the DB using fuzzy matching.
     If multiple matches, ask the user to pick one.
     
+    "report in downloads" only matches below the downloads folder; if
+    nothing does, the whole value is tried as a name.
+
     chooser: optional callable(prompt_str, options_list) -> selected_option_str
              Defaults to terminal input() when None.
     """
-    paths = get_close_file_or_dir(value)
+    name, scope = split_scope(value)
+    paths = get_close_file_or_dir(name, scope) if scope else None
+    if not paths:
+        paths = get_close_file_or_dir(value)
     if not paths:
         return None
     if len(paths) == 1:
@@ -103,7 +135,9 @@ def normalize_text(text):
 
 def rule_engine(text):
     text = normalize_text(text)
-    if "copy" in text:
+    if parse_bulk(text) is not None:
+        return {"action": "bulk", "value": text}
+    elif "copy" in text:
         return {"action": "copy", "value": ""}
     elif "paste" in text:
         return {"action": "paste", "value": ""}
@@ -168,17 +202,19 @@ Output ONLY valid JSON.
 No explanations.
 No extra text.
 If the value is not specified, return an empty string for value.
+Add "verify": true only for get_size when the user asks to verify or double-check the size on disk.
 
 Allowed schema:
 {
   "action": string,
-  "value": string
+  "value": string,
+  "verify": boolean (optional)
 }
 
 Allowed actions and what "value" should contain:
 - "open"            -> value: the app, file, folder, or thing to open
 - "delete"          -> value: file or folder name to delete
-- "list_directory"  -> value: directory name to list (or "" for current directory)
+- "list_directory"  -> value: directory name to list (or "" for current directory, "more" for the next page)
 - "get_size"        -> value: file or folder name to get size of
 - "show_space"      -> value: "" (shows disk space)
 - "navigate"        -> value: directory name to navigate to
@@ -188,6 +224,7 @@ Allowed actions and what "value" should contain:
 - "type_text"       -> value: the text to type
 - "rename"          -> value: file or folder name to rename
 - "move"            -> value: file or folder name to move
+- "bulk"            -> value: the whole request, for deleting or moving all files of a type ("delete all .tmp files in downloads")
 
 Examples:
 User: "Open documents"       -> {"action": "open", "value": "documents"}
@@ -202,6 +239,8 @@ User: "Rename report.pdf"    -> {"action": "rename", "value": "report.pdf"}
 User: "Move my_file.txt"     -> {"action": "move", "value": "my_file.txt"}
 User: "Navigate to downloads" -> {"action": "navigate", "value": "downloads"}
 User: "Size of photos"       -> {"action": "get_size", "value": "photos"}
+User: "Verify the size of photos" -> {"action": "get_size", "value": "photos", "verify": true}
+User: "Move all screenshots to pictures" -> {"action": "bulk", "value": "move all screenshots to pictures"}
 """
             },
             {
@@ -249,9 +288,11 @@ def execute(command, chooser=None):
         if value_:
             if os.path.isfile(value_):
                 os.remove(value_)
+                _forget_path(value_)
                 print(f"Deleted file: {value_}")
             elif os.path.isdir(value_):
                 shutil.rmtree(value_)
+                _forget_path(value_)
                 print(f"Deleted directory: {value_}")
             else:
                 print(f"Path exists but is neither file nor directory: {value_}")
@@ -271,12 +312,24 @@ def execute(command, chooser=None):
                 print(f"No matching file, directory, or shell folder found for '{value}'.")
 
     elif action == "list_directory":
-        value_ = check_files_and_directories(value, chooser=chooser) if value else os.getcwd()
+        offset = 0
+        if value.lower() in MORE_WORDS and _listing["path"]:
+            value_, offset = _listing["path"], _listing["offset"]
+        else:
+            value_ = check_files_and_directories(value, chooser=chooser) if value else os.getcwd()
         if value_ and os.path.isdir(value_):
-            contents = os.listdir(value_)
-            print(f"Contents of '{value_}':")
-            for item in contents:
-                print(f"  {item}")
+            # Served a page at a time from the index; see crawler.list_directory.
+            entries, total, source = list_directory(value_, offset=offset)
+            shown = offset + len(entries)
+            if not entries and total:
+                print(f"End of '{value_}' ({total} entries).")
+            else:
+                print(f"Contents of '{value_}' ({offset + 1}-{shown} of {total}, {source}):")
+            for name, is_dir, _, _ in entries:
+                print(f"  {name}{os.sep if is_dir else ''}")
+            _listing.update(path=value_, offset=shown)
+            if shown < total:
+                print(f"  ... {total - shown} more; say \"list more\" for the next page.")
         else:
             print(f"No matching directory found for '{value}'.")
 
@@ -287,12 +340,17 @@ def execute(command, chooser=None):
                 size = os.path.getsize(value_)
                 print(f"Size of '{value_}': {size} bytes ({size / 1024:.2f} KB)")
             elif os.path.isdir(value_):
-                total = sum(
-                    os.path.getsize(os.path.join(dp, f))
-                    for dp, _, fnames in os.walk(value_)
-                    for f in fnames
-                )
-                print(f"Size of '{value_}': {total} bytes ({total / (1024*1024):.2f} MB)")
+                # Rollups kept up to date by the index writers; walking is the fallback.
+                totals = indexed_size(value_)
+                if totals is None:
+                    total = _walk_size(value_)
+                    print(f"Size of '{value_}': {total} bytes ({total / (1024*1024):.2f} MB)")
+                else:
+                    total, files = totals
+                    print(f"Size of '{value_}': {total} bytes ({total / (1024*1024):.2f} MB, "
+                          f"{files} files, from the index)")
+                    if VERIFY_SIZES or command.get("verify") is True:
+                        threading.Thread(target=_verify_size, args=(value_, total), daemon=True).start()
         else:
             print(f"No matching file or directory for '{value}'.")
 
@@ -355,6 +413,7 @@ def execute(command, chooser=None):
             if new_name:
                 new_path = os.path.join(os.path.dirname(value_), new_name)
                 os.rename(value_, new_path)
+                _move_path(value_, new_path)
                 print(f"Renamed '{value_}' -> '{new_path}'")
             else:
                 print("No new name provided. Rename cancelled.")
@@ -372,13 +431,47 @@ def execute(command, chooser=None):
             dest = (dest or "").strip()
             if dest:
                 dest_path = check_files_and_directories(dest, chooser=chooser) or dest
-                shutil.move(value_, dest_path)
+                dest_path = shutil.move(value_, dest_path)
+                _move_path(value_, dest_path)
                 print(f"Moved '{value_}' -> '{dest_path}'")
             else:
                 print("No destination provided. Move cancelled.")
         else:
             print(f"No matching file or directory for '{value}'.")
 
+    elif action == "bulk":
+        request = parse_bulk(value)
+        if request is None:
+            print(f"Could not understand '{value}' as a bulk action.")
+            return
+        scope = destination = None
+        if request.scope:
+            scope = check_files_and_directories(request.scope, chooser=chooser)
+            if not scope or not os.path.isdir(scope):
+                print(f"No matching directory found for '{request.scope}'.")
+                return
+        if request.action == "move":
+            destination = check_files_and_directories(request.destination, chooser=chooser)
+            if not destination or not os.path.isdir(destination):
+                print(f"No matching directory found for '{request.destination}'.")
+                return
+
+        # One indexed query for the whole set; nothing changes until confirmed.
+        targets = bulk_targets(request, scope=scope, destination=destination)
+        if not targets:
+            print(f"No {request.query.label} to {request.action}.")
+            return
+        prompt = f"{preview(request, targets, scope, destination)}\nGo ahead? (y/n): "
+        if chooser is not None:
+            answer = chooser(prompt, ["yes", "no"])
+        else:
+            answer = input(prompt)
+        if (answer or "").strip().lower() in ("y", "yes"):
+            done, failed = run_bulk(request, targets, resolver, destination)
+            print(summarize(request, done, failed, destination))
+        else:
+            print("Bulk action cancelled.")
+
 
 def send_to_llm(text, chooser=None):
     rule = rule_engine(text)
@@ -0,0 +1,664 @@
+# resolver.py
+# Name -> path lookups over files.db and its shards, shared by the mic
+# executor and new_arch.py.
+import os
+import threading
+import time
+from array import array
+from collections import OrderedDict
+from itertools import groupby
+from db import (connect, database_for, databases_for, decayed_score, forget_frecency, frecent_paths,
+                generation, index_databases, move_frecency, node_changes, node_paths, record_use,
+                subtree_nodes)
+from crawler import apply_deletes, apply_moves
+from name_index import EditIndex, NameTable, TrigramIndex, closest
+from name_matrix import NameMatrix
+from snapshot import build_snapshot, load_snapshot, name_keys, save_snapshot
+
+DB_PATH = "files.db"
+FUZZY_CUTOFF = 0.6
+MATCH_RETRIES = 3   # names dropped per query when every path behind them is gone
+DIR_CACHE_SIZE = 50000  # directory paths kept between queries
+RELOAD_INTERVAL = 5.0   # seconds between checks for DBs changed by someone else
+RELOAD_SETTLE = 10.0    # a DB has to stop changing this long before it is fully reloaded
+CATCH_UP_BATCH = 20000  # logged changes applied per hold of the lock
+QUERY_CACHE_SIZE = 1024 # recent queries whose results are kept, misses included
+HOT_SET_SIZE = 500      # most frecent paths checked before the name indexes
+# Fuzzy fallback: "index" narrows candidates with the edit and trigram
+# indexes; "numpy" scores every name of a plausible length (name_matrix.py).
+ENGINES = ("index", "numpy")
+ENGINE = "index"
+
+
+def _each(cursor, update, rows):
+    for row in rows:
+        update(cursor, *row)
+
+
+class ShardIndex:
+    """Name -> nodes map for one index DB (files.db or a per-root shard).
+
+    Keys live in a NameTable and each key's nodes (file_nodes ids, dir_nodes
+    ids negated; see db.node_paths) in one flat array, so the map holds no
+    per-entry Python objects. Paths are read back from the DB for the few
+    names a query returns. Keys changed after the load move to `_changed`.
+
+    All of it comes from the DB's newest snapshot file (see snapshot.py),
+    with the changes logged since it was written (db.node_changes) applied
+    on top. Only when the log doesn't reach back that far is it rebuilt
+    from the DB and the snapshot rewritten first. The file is mapped
+    read-only, so every process using a resolver (the executor,
+    new_arch.py, other workers) shares one copy in the page cache; only
+    changes made since stay private.
+
+    With the "numpy" engine, fuzzy lookups scan a NameMatrix instead; it is
+    built from the names after loading and kept per process.
+    """
+
+    def __init__(self, db_path, engine=ENGINE):
+        if engine not in ENGINES:
+            raise ValueError(f"unknown resolver engine {engine!r}; expected one of {ENGINES}")
+        self.db_path = db_path
+        self.engine = engine
+        self.matrix = None
+        self.names = NameTable()
+        self.trigrams = TrigramIndex(self.names)
+        self.edits = EditIndex(self.names)
+        self._starts = array("Q", [0])   # key id -> slice of _nodes
+        self._nodes = array("q")
+        self._changed = {}                # key id -> list of nodes
+        self._conn = None                 # kept open for path lookups
+        self._dir_paths = {}              # dir id -> path, cleared on any move or delete
+        self.generation = None            # DB write generation the index was built at
+        self.entry_count = 0
+        self._ready = False
+        self._load_index()
+
+    def _entries(self, key_id):
+        changed = self._changed.get(key_id)
+        if changed is not None:
+            return changed
+        if key_id + 1 < len(self._starts):
+            return self._nodes[self._starts[key_id]:self._starts[key_id + 1]]
+        return ()
+
+    def _file(self, key, node):
+        key_id = self.names.index(key)
+        if key_id is None:
+            key_id = self.names.add(key)
+            self.trigrams.add(key_id)
+            self.edits.add(key_id)
+            if self.matrix is not None:
+                self.matrix.add(key_id)
+            self.entry_count += 1
+        entries = list(self._entries(key_id))
+        if node not in entries:
+            entries.append(node)
+        self._changed[key_id] = entries
+
+    def _unfile(self, key, node):
+        key_id = self.names.index(key)
+        if key_id is None:
+            return
+        entries = [n for n in self._entries(key_id) if n != node]
+        self._changed[key_id] = entries
+        if not entries:
+            self._drop_key(key_id)
+
+    def _drop_key(self, key_id):
+        self.trigrams.remove(key_id)
+        self.edits.remove(key_id)
+        if self.matrix is not None:
+            self.matrix.remove(key_id)
+        self.names.remove(key_id)
+        self._changed[key_id] = []
+        self.entry_count -= 1
+
+    def _cursor(self):
+        if self._conn is None:
+            self._conn = connect(self.db_path, timeout=30)
+        return self._conn.cursor()
+
+    def nodes_under(self, path):
+        """(node, name) rows for `path` and everything below it, read before it changes."""
+        return subtree_nodes(self._cursor(), path)
+
+    def add_nodes(self, nodes):
+        self._dir_paths.clear()
+        for node, name in nodes:
+            for key in name_keys(name, node < 0):
+                self._file(key, node)
+        self._ready = self.entry_count > 0
+
+    def drop_nodes(self, nodes):
+        self._dir_paths.clear()
+        for node, name in nodes:
+            for key in name_keys(name, node < 0):
+                self._unfile(key, node)
+        self._ready = self.entry_count > 0
+
+    def rename(self, node, old_name, new_name):
+        """Re-key a node moved within this DB; nodes below it follow on their own."""
+        self.drop_nodes([(node, old_name)])
+        self.add_nodes([(node, new_name)])
+
+    def read_changes(self):
+        """db.node_changes since this index's generation, on a connection of its own."""
+        conn = connect(self.db_path, timeout=30)
+        try:
+            return node_changes(conn.cursor(), self.generation)
+        finally:
+            conn.close()
+
+    def apply_changes(self, rows):
+        """Apply (node, name, added) rows from node_changes in order."""
+        for added, run in groupby(rows, key=lambda row: row[2]):
+            nodes = [(node, name) for node, name, _ in run]
+            if added:
+                self.add_nodes(nodes)
+            else:
+                self.drop_nodes(nodes)
+
+    def _load_index(self):
+        if not os.path.exists(self.db_path):
+            print(f"[RESOLVER] DB not found: {self.db_path}")
+            self._ready = False
+            return
+
+        try:
+            start = time.time()
+            snapshot = load_snapshot(self.db_path, behind=True)
+            source = "snapshot"
+            changes = None
+            if snapshot is not None:
+                self.generation = snapshot.generation
+                changes = self.read_changes()
+                if changes is None:
+                    snapshot = None   # the log moved past it in the meantime
+            if snapshot is None:
+                snapshot = build_snapshot(self.db_path)
+                source = "DB scan"
+                try:
+                    if snapshot.generation is not None:
+                        save_snapshot(self.db_path, snapshot)
+                        # Switch to the mapped copy other processes share.
+                        snapshot = load_snapshot(self.db_path) or snapshot
+                except OSError as e:
+                    print(f"[RESOLVER WARNING] Could not save snapshot for {self.db_path}: {e}")
+
+            self.names, self._starts, self._nodes = snapshot.names, snapshot.starts, snapshot.nodes
+            self.trigrams, self.edits, self._changed = snapshot.trigrams, snapshot.edits, {}
+            self.generation = snapshot.generation
+            self.entry_count = len(self.names)
+            if changes is not None:
+                self.generation, rows = changes
+                self.apply_changes(rows)
+                if rows:
+                    source += f" + {len(rows)} logged changes"
+            self._ready = self.entry_count > 0
+            nbytes = snapshot.nbytes()
+            if self.engine == "numpy":
+                self.matrix = NameMatrix(self.names)
+                nbytes += self.matrix.nbytes()
+            print(f"[RESOLVER] DB index loaded from {self.db_path} ({source}): {self.entry_count} names, "
+                  f"{len(self._nodes)} entries, {nbytes / 2**20:.1f} MB of arrays "
+                  f"in {time.time() - start:.2f}s.")
+
+        except Exception as e:
+            print(f"[RESOLVER] Failed to load DB index {self.db_path}: {e}")
+            self._ready = False
+
+    def _paths(self, key_id):
+        """Paths still filed under `key_id`.
+
+        Entries whose rows are gone are dropped, but only while this index
+        is current with the DB: behind it, a missing id may just have been
+        renumbered (a bulk load) and the next reload files it again.
+        """
+        key = self.names[key_id]
+        entries = self._entries(key_id)
+        if len(self._dir_paths) > DIR_CACHE_SIZE:
+            self._dir_paths.clear()
+        found = node_paths(self._cursor(), entries, self._dir_paths)
+
+        paths, live = [], []
+        for node in entries:
+            path = found.get(node)
+            # A reused row id may now belong to another name.
+            if path is None or key not in name_keys(os.path.basename(path) or path, node < 0):
+                continue
+            live.append(node)
+            if path not in paths:
+                paths.append(path)
+
+        if len(live) < len(entries) and self.generation == generation(self._cursor()):
+            self._changed[key_id] = live
+            if not live:
+                self._drop_key(key_id)
+        return paths
+
+    def match(self, query):
+        """(score, paths) for the best name in this shard; score is 1.0 on an exact hit."""
+        if not self._ready:
+            return 0.0, []
+
+        key_id = self.names.index(query)
+        if key_id is not None:
+            paths = self._paths(key_id)
+            if paths:
+                return 1.0, paths
+
+        for _ in range(MATCH_RETRIES):
+            if self.matrix is not None:
+                score, name = self.matrix.best_match(query, FUZZY_CUTOFF)
+            else:
+                # A misheard letter or two first, then anything similar enough.
+                score, name = self.edits.best_match(query)
+                if name is None:
+                    score, name = self.trigrams.best_match(query, FUZZY_CUTOFF)
+            if name is None:
+                return 0.0, []
+            paths = self._paths(self.names.index(name))
+            if paths:
+                return score, paths
+        return 0.0, []
+
+    def complete(self, prefix, limit):
+        """Up to `limit` names in this shard starting with `prefix`, in name order."""
+        if not self._ready:
+            return []
+        return [self.names[key_id] for key_id in self.names.with_prefix(prefix, limit)]
+
+    def match_within(self, query, container):
+        """(score, paths) for the best name below the directory `container`.
+
+        Walks the subtree through the parent links (idx_dir_parent and
+        idx_file_dir) and scans only its names, so the cost follows the
+        subtree's size rather than the whole index.
+        """
+        keyed = {}
+        for node, name in self.nodes_under(container)[1:]:
+            for key in name_keys(name, node < 0):
+                keyed.setdefault(key, []).append(node)
+
+        if query in keyed:
+            score, key = 1.0, query
+        else:
+            score, key = closest(query, keyed, FUZZY_CUTOFF)
+        if key is None:
+            return 0.0, []
+
+        found = node_paths(self._cursor(), keyed[key], self._dir_paths)
+        paths = []
+        for node in keyed[key]:
+            if node in found and found[node] not in paths:
+                paths.append(found[node])
+        return score, paths
+
+
+def _db_generation(db_path):
+    if not os.path.exists(db_path):
+        return None
+    conn = connect(db_path)
+    try:
+        return generation(conn.cursor())
+    finally:
+        conn.close()
+
+
+class DbPathResolver:
+    """Looks names up across files.db and every shard registered in it.
+
+    With `auto_reload`, a background thread applies what the crawler, the
+    watcher and other processes wrote to each DB every RELOAD_INTERVAL
+    seconds, read from its node_changes log, so rows come in while a crawl
+    is still running. They go in CATCH_UP_BATCH at a time under the lock
+    lookups hold, so a query sees a batch entirely or not at all. A DB whose log no longer reaches back to the loaded
+    generation (a bulk load starts it over) or that was newly registered
+    is loaded in full once it has stayed unchanged for RELOAD_SETTLE
+    seconds, usually straight from the snapshot the crawler just wrote, off
+    to the side, and swapped in. Lookups keep using the old one meanwhile;
+    write-through changes made during the rebuild are replayed onto the
+    new one before the swap.
+
+    Results of recent queries, empty ones included, are kept in an LRU
+    cache tagged with the index generation; every write-through or reload
+    starts a new generation, so nothing cached before it is served again.
+
+    Ahead of both sits the hot-set: the HOT_SET_SIZE paths with the highest
+    frecency (see db.record_use). A query naming one of them exactly is
+    answered from it alone, and fuzzy results are ordered by it. The
+    reload thread re-reads it too, so opens made by the executor reach
+    other processes' resolvers (the GUI's suggestions).
+    """
+
+    def __init__(self, db_path=DB_PATH, auto_reload=True, engine=ENGINE):
+        self.db_path = db_path
+        self.engine = engine
+        self.shards = [ShardIndex(path, engine) for path in index_databases(db_path)]
+        self.entry_count = sum(shard.entry_count for shard in self.shards)
+        self._ready = any(shard._ready for shard in self.shards)
+        # Held by lookups and by every change to the shards or the hot-set,
+        # so a query never sees a batch of changes half applied.
+        self._lock = threading.RLock()
+        self._replay = None   # (db path, ShardIndex method, args) while a reload runs
+        self.generation = 0   # bumped whenever any shard's entries change
+        self._cache = OrderedDict()   # query, or (query, scope dirs) -> (generation, paths)
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self._hot = {}          # key -> hot paths filed under it
+        self._hot_scores = {}   # hot path -> (score, when it was scored)
+        self.hot_hits = 0
+        self._load_hot_set()
+        if auto_reload:
+            threading.Thread(target=self._reload_loop, name="resolver-reload", daemon=True).start()
+
+    def resolve(self, target, scope=None):
+        """Paths for `target`, best first; with `scope`, only below the directory it names."""
+        query = (target or "").strip().strip("\"'").lower()
+        if not query or not self._ready:
+            return []
+        with self._lock:
+            if scope:
+                return self._resolve_within(query, scope)
+
+            hot = self._hot_match(query)
+            if hot:
+                self.hot_hits += 1
+                return hot
+
+            return self._cached(query, lambda: (shard.match(query) for shard in self.shards))
+
+    def complete(self, prefix, limit=10):
+        """Up to `limit` indexed names starting with `prefix`, for suggestions as the user types.
+
+        Names of paths in the hot-set come first, most frecent first; the
+        rest follow in name order, read straight off each shard's sorted
+        name table.
+        """
+        prefix = (prefix or "").strip().strip("\"'").lower()
+        if not prefix:
+            return []
+        with self._lock:
+            return self._complete(prefix, limit)
+
+    def _complete(self, prefix, limit):
+        hot = {}
+        for key, paths in self._hot.items():
+            if key.startswith(prefix):
+                hot[key] = max(map(self._frecency, paths))
+        names = []
+        for key in sorted(hot, key=hot.get, reverse=True):
+            if len(names) == limit:
+                break
+            if any(os.path.exists(path) for path in self._hot[key]):
+                names.append(key)
+
+        rest = set()
+        for shard in self.shards:
+            rest.update(shard.complete(prefix, limit))
+        names.extend(sorted(rest - set(names))[:limit - len(names)])
+        return names
+
+    def _resolve_within(self, query, scope):
+        containers = [path for path in self.resolve(scope) if os.path.isdir(path)]
+        # Containers with a shard, each searched through its own subtree only.
+        scoped = [(self._shard_for(path), path) for path in containers]
+        return self._cached((query, tuple(containers)),
+                            lambda: (shard.match_within(query, path) for shard, path in scoped if shard))
+
+    def _cached(self, cache_key, search):
+        """Cached paths for `cache_key`, else the merged (score, paths) results of `search()`."""
+        cached = self._cache.get(cache_key)
+        if cached is not None and cached[0] == self.generation:
+            self._cache.move_to_end(cache_key)
+            self.cache_hits += 1
+            return list(cached[1])
+        self.cache_misses += 1
+        seen_at = self.generation   # a reload may swap shards while we search
+
+        # Keep the best-scoring name; shards tying on it contribute their paths too.
+        best_score = 0.0
+        best_paths = []
+        for score, paths in search():
+            if not paths or score < best_score:
+                continue
+            if score > best_score:
+                best_score, best_paths = score, []
+            best_paths.extend(p for p in paths if p not in best_paths)
+        best_paths.sort(key=self._frecency, reverse=True)
+
+        self._cache[cache_key] = (seen_at, tuple(best_paths))
+        self._cache.move_to_end(cache_key)
+        while len(self._cache) > QUERY_CACHE_SIZE:
+            self._cache.popitem(last=False)
+        return best_paths
+
+    def cache_stats(self):
+        return {"hits": self.cache_hits, "misses": self.cache_misses,
+                "size": len(self._cache), "capacity": QUERY_CACHE_SIZE,
+                "hot_hits": self.hot_hits, "hot_paths": len(self._hot_scores)}
+
+    # Hot-set
+
+    @staticmethod
+    def _hot_keys(path):
+        base = os.path.basename(path) or path
+        return name_keys(base, False) | name_keys(base, True)
+
+    def _load_hot_set(self):
+        """(Re)read the hot-set; other processes' opens show up here too."""
+        if not os.path.exists(self.db_path):
+            return
+        conn = connect(self.db_path)
+        try:
+            rows = frecent_paths(conn.cursor(), HOT_SET_SIZE)
+        finally:
+            conn.close()
+
+        now = time.time()
+        hot, scores = {}, {}
+        for path, score in rows:
+            for key in self._hot_keys(path):
+                hot.setdefault(key, []).append(path)
+            scores[path] = (score, now)
+        with self._lock:
+            if scores.keys() != self._hot_scores.keys():
+                self.generation += 1   # cached results may now rank differently
+            self._hot, self._hot_scores = hot, scores
+
+    def _add_hot(self, path, score, now):
+        if path not in self._hot_scores:
+            for key in self._hot_keys(path):
+                self._hot.setdefault(key, []).append(path)
+        self._hot_scores[path] = (score, now)
+
+    def _drop_hot(self, path):
+        if self._hot_scores.pop(path, None) is None:
+            return
+        for key, paths in list(self._hot.items()):
+            if path in paths:
+                paths.remove(path)
+                if not paths:
+                    del self._hot[key]
+
+    def _frecency(self, path):
+        score = self._hot_scores.get(path)
+        return decayed_score(score[0], score[1], time.time()) if score else 0.0
+
+    def _hot_match(self, query):
+        paths = self._hot.get(query)
+        if not paths:
+            return []
+        for path in [p for p in paths if not os.path.exists(p)]:
+            self._drop_hot(path)   # changed outside the executor; the indexes know better
+        return sorted(self._hot.get(query, ()), key=self._frecency, reverse=True)
+
+    def record_use(self, path):
+        """Count an open of `path` towards its frecency and the hot-set."""
+        now = time.time()
+        conn = connect(self.db_path)
+        try:
+            score = record_use(conn.cursor(), path, now)
+            conn.commit()
+        finally:
+            conn.close()
+
+        with self._lock:
+            self._add_hot(path, score, now)
+            if len(self._hot_scores) > HOT_SET_SIZE:
+                self._drop_hot(min(self._hot_scores, key=self._frecency))
+            self.generation += 1   # cached results may now rank differently
+
+    def _hot_changed(self, update, *args):
+        conn = connect(self.db_path)
+        try:
+            update(conn.cursor(), *args)
+            conn.commit()
+        finally:
+            conn.close()
+        self._load_hot_set()
+
+    def _shard_for(self, path, db_path=None):
+        db_path = db_path or database_for(path, self.db_path)
+        for shard in self.shards:
+            if shard.db_path == db_path:
+                return shard
+        return None
+
+    def _refresh_counts(self):
+        # Called after every change to the shards; drops the cached results.
+        self.generation += 1
+        self.entry_count = sum(shard.entry_count for shard in self.shards)
+        self._ready = any(shard._ready for shard in self.shards)
+
+    def _change(self, shard, method, *args):
+        getattr(shard, method)(*args)
+        if self._replay is not None:
+            self._replay.append((shard.db_path, method, args))
+
+    # Executors call these right after touching the filesystem, so the DB rows
+    # and the maps above change in the same step and lookups never go stale.
+
+    def forget(self, path):
+        self.forget_all([path])
+
+    def forget_all(self, paths):
+        """forget() for a batch of deleted paths, written in one transaction per DB."""
+        with self._lock:
+            dropped = []
+            owners = databases_for(paths, self.db_path)
+            for path in paths:
+                shard = self._shard_for(path, owners[path])
+                if shard:
+                    dropped.append((shard, shard.nodes_under(path)))
+            apply_deletes(paths, self.db_path)
+            for shard, nodes in dropped:
+                self._change(shard, "drop_nodes", nodes)
+            self._hot_changed(_each, forget_frecency, [(path,) for path in paths])
+            self._refresh_counts()
+
+    def moved(self, src, dest):
+        self.moved_all([(src, dest)])
+
+    def moved_all(self, moves):
+        """moved() for a batch of (src, dest) pairs, written in one transaction per DB."""
+        with self._lock:
+            changes = []
+            owners = databases_for([path for move in moves for path in move], self.db_path)
+            for src, dest in moves:
+                src_shard, dest_shard = self._shard_for(src, owners[src]), self._shard_for(dest, owners[dest])
+                nodes = src_shard.nodes_under(src) if src_shard else []
+                changes.append((src_shard, dest_shard, nodes, dest))
+            apply_moves(moves, self.db_path)
+
+            for src_shard, dest_shard, nodes, dest in changes:
+                if nodes and src_shard is dest_shard:
+                    # Same DB: the rows keep their ids, only the moved node's name changed.
+                    self._change(src_shard, "rename", nodes[0][0], nodes[0][1], os.path.basename(dest))
+                else:
+                    if src_shard:
+                        self._change(src_shard, "drop_nodes", nodes)
+                    if dest_shard:
+                        self._change(dest_shard, "add_nodes", dest_shard.nodes_under(dest))
+            self._hot_changed(_each, move_frecency, moves)
+            self._refresh_counts()
+
+    # Changes made by the crawler and the watcher arrive through the reload
+    # thread. Our own write-throughs are logged too; applying them again
+    # changes nothing.
+
+    def _reload_loop(self):
+        seen = {}   # db path -> (generation, when it was first seen)
+        while True:
+            time.sleep(RELOAD_INTERVAL)
+            try:
+                self._load_hot_set()
+                behind = self._catch_up()
+                stale = self._settled_changes(seen, behind)
+                if stale:
+                    self.reload(stale)
+            except Exception as e:
+                print(f"[RESOLVER WARNING] Reload failed: {e}")
+
+    def _catch_up(self):
+        """Apply the changes logged in each loaded DB since its shard's generation.
+
+        Returns the DB paths whose log doesn't reach back that far; those
+        need a full reload.
+        """
+        behind = set()
+        for shard in list(self.shards):
+            changes = shard.read_changes()
+            if changes is None:
+                behind.add(shard.db_path)
+                continue
+            current, rows = changes
+            for start in range(0, len(rows), CATCH_UP_BATCH):
+                with self._lock:
+                    shard.apply_changes(rows[start:start + CATCH_UP_BATCH])
+                    self._refresh_counts()
+            with self._lock:
+                shard.generation = current
+            if rows:
+                print(f"[RESOLVER] Applied {len(rows)} change(s) from {shard.db_path}; "
+                      f"{self.entry_count} names.")
+        return behind
+
+    def _settled_changes(self, seen, behind):
+        loaded = {shard.db_path: shard.generation for shard in self.shards}
+        now = time.time()
+        stale = []
+        for db_path in index_databases(self.db_path):
+            current = _db_generation(db_path)
+            if db_path in loaded and (db_path not in behind or current == loaded[db_path]):
+                seen.pop(db_path, None)
+            elif seen.get(db_path, (None,))[0] != current:
+                seen[db_path] = (current, now)
+            elif now - seen[db_path][1] >= RELOAD_SETTLE:
+                stale.append(db_path)
+        return stale
+
+    def reload(self, db_paths):
+        """Rebuild the indexes of `db_paths` and swap them in; lookups aren't blocked meanwhile."""
+        start = time.time()
+        with self._lock:
+            self._replay = []
+        try:
+            fresh = {db_path: ShardIndex(db_path, self.engine) for db_path in db_paths}
+        except BaseException:
+            self._replay = None
+            raise
+
+        with self._lock:
+            # Write-throughs are idempotent, so replaying ones the rebuild
+            # already saw is harmless.
+            for db_path, method, args in self._replay:
+                if db_path in fresh:
+                    getattr(fresh[db_path], method)(*args)
+            self._replay = None
+            shards = [fresh.pop(shard.db_path, shard) for shard in self.shards]
+            self.shards = shards + list(fresh.values())   # newly registered shards last
+            self._refresh_counts()
+        print(f"[RESOLVER] Reloaded {len(db_paths)} DB(s) in {time.time() - start:.2f}s; "
+              f"{self.entry_count} names.")
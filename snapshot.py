@@ -0,0 +1,223 @@
+# snapshot.py
+# Prebuilt resolver lookups for one index DB, saved next to it as
+# "<db>.<generation>.names" so the executor can map them in instead of
+# rebuilding them from a full table scan on every start.
+#
+# The file is a fixed-size JSON header followed by the raw arrays (see
+# name_index to_arrays), each 8-byte aligned so it can be viewed in place.
+# A snapshot is used while the DB's write generation still matches the one
+# it was built from, or while the DB's node_changes log reaches back to it
+# so the changes since can be applied on top (see db.node_changes). Each
+# generation gets its own file because a file another process still maps
+# can't be replaced on Windows; older ones are removed once nothing holds
+# them.
+import glob
+import json
+import mmap
+import os
+import struct
+import sys
+import time
+from array import array
+
+import name_index
+from db import changes_since, connect, generation
+from name_index import EditIndex, NameTable, TrigramIndex
+
+SNAPSHOT_SUFFIX = ".names"
+SNAPSHOT_VERSION = 2
+MAGIC = b"DEEPANIX"
+HEADER_SIZE = 4096
+
+
+class ResolverSnapshot:
+    """A DB's lookup keys, the nodes filed under each and the name indexes over them.
+
+    `starts[k]:starts[k + 1]` slices `nodes` for key id k; nodes are
+    file_nodes ids, or dir_nodes ids negated (see db.node_paths).
+    """
+
+    def __init__(self, generation, names, starts, nodes, trigrams, edits):
+        self.generation = generation
+        self.names = names
+        self.starts = starts
+        self.nodes = nodes
+        self.trigrams = trigrams
+        self.edits = edits
+
+    def nbytes(self):
+        return (self.names.nbytes() + self.trigrams.nbytes() + self.edits.nbytes()
+                + self.starts.itemsize * len(self.starts) + self.nodes.itemsize * len(self.nodes))
+
+
+def name_keys(name, is_dir):
+    """Lookup keys for an entry: a directory's name; a file's stem and full name."""
+    # Roots are stored under their full path.
+    keys = {os.path.basename(name) or name} if is_dir else {os.path.splitext(name)[0], name}
+    return {key.strip().lower() for key in keys} - {""}
+
+
+def snapshot_path(db_path, generation):
+    return f"{db_path}.{generation}{SNAPSHOT_SUFFIX}"
+
+
+def _saved_generations(db_path):
+    found = []
+    for path in glob.glob(glob.escape(db_path) + ".*" + SNAPSHOT_SUFFIX):
+        middle = path[len(db_path) + 1:-len(SNAPSHOT_SUFFIX)]
+        if middle.isdigit():
+            found.append(int(middle))
+    return sorted(found, reverse=True)
+
+
+def _remove_older(db_path, keep):
+    for path in glob.glob(glob.escape(db_path) + ".*" + SNAPSHOT_SUFFIX):
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass  # still mapped somewhere; a later save retries
+
+
+def _params():
+    # Anything that changes what the saved arrays mean.
+    return {"byteorder": sys.byteorder, "max_edits": name_index.MAX_EDITS,
+            "prefix_length": name_index.PREFIX_LENGTH, "id_type": name_index.ID_TYPE}
+
+
+def build_snapshot(db_path):
+    """Read every node of `db_path` and build its lookups."""
+    conn = connect(db_path)
+    try:
+        cursor = conn.cursor()
+        # One read transaction, so the generation matches the rows read.
+        cursor.execute("BEGIN")
+        current = generation(cursor)
+        grouped = {}
+        for node, name in cursor.execute("SELECT id, name FROM file_nodes"):
+            for key in name_keys(name, False):
+                grouped.setdefault(key, []).append(node)
+        for node, name in cursor.execute("SELECT -id, name FROM dir_nodes"):
+            for key in name_keys(name, True):
+                grouped.setdefault(key, []).append(node)
+        conn.rollback()
+    finally:
+        conn.close()
+
+    names = NameTable(grouped)
+    starts, nodes = array("Q", [0]), array("q")
+    for key_id in range(len(names)):
+        nodes.extend(grouped[names[key_id]])
+        starts.append(len(nodes))
+    del grouped
+
+    return ResolverSnapshot(current, names, starts, nodes, TrigramIndex(names), EditIndex(names))
+
+
+def save_snapshot(db_path, snapshot):
+    """Write a freshly built snapshot next to `db_path`; returns its path."""
+    names, offsets = snapshot.names.to_arrays()
+    sections = {"names": names, "name_offsets": offsets,
+                "starts": snapshot.starts, "nodes": snapshot.nodes}
+    sections.update(("trigram." + key, value) for key, value in snapshot.trigrams.to_arrays().items())
+    sections.update(("edit." + key, value) for key, value in snapshot.edits.to_arrays().items())
+
+    layout = {}
+    offset = HEADER_SIZE
+    for key, value in sections.items():
+        view = memoryview(value)
+        layout[key] = [view.format, offset, len(view)]
+        offset += -(-view.nbytes // 8) * 8
+
+    header = json.dumps({"version": SNAPSHOT_VERSION, "generation": snapshot.generation,
+                         "params": _params(), "sections": layout}).encode("utf-8")
+    if len(MAGIC) + 4 + len(header) > HEADER_SIZE:
+        raise ValueError("snapshot header too large")
+
+    path = snapshot_path(db_path, snapshot.generation)
+    temp = f"{path}.{os.getpid()}.tmp"   # several processes may rebuild at once
+    with open(temp, "wb") as f:
+        f.write(MAGIC + struct.pack("<I", len(header)) + header)
+        for key, value in sections.items():
+            f.seek(layout[key][1])
+            f.write(memoryview(value))
+        f.truncate(offset)
+    try:
+        os.replace(temp, path)
+    except OSError:
+        # Another process saved (and maps) this generation already.
+        os.remove(temp)
+        if not os.path.exists(path):
+            raise
+    _remove_older(db_path, path)
+    return path
+
+
+def write_snapshot(db_path):
+    """Build and save the snapshot for `db_path`; crawlers call this after a crawl."""
+    start = time.time()
+    snapshot = build_snapshot(db_path)
+    path = save_snapshot(db_path, snapshot)
+    print(f"[SNAPSHOT] Wrote {path}: {len(snapshot.names)} names, "
+          f"{os.path.getsize(path) / 2**20:.1f} MB in {time.time() - start:.2f}s")
+    return path
+
+
+def load_snapshot(db_path, behind=False):
+    """Map the snapshot for `db_path`, or None if it's missing, unreadable or stale.
+
+    With `behind`, the newest snapshot is taken even if the DB has moved
+    on since, as long as its node_changes still reach back to it; the
+    caller applies those on top of the returned snapshot.
+    """
+    if not os.path.exists(db_path):
+        return None
+    conn = connect(db_path)
+    try:
+        current = generation(conn.cursor())
+        oldest = changes_since(conn.cursor()) if behind else None
+    finally:
+        conn.close()
+    if current is None:
+        return None
+    if oldest is not None:
+        saved = [gen for gen in _saved_generations(db_path) if oldest <= gen <= current]
+        if saved:
+            current = saved[0]
+    path = snapshot_path(db_path, current)
+    if not os.path.exists(path):
+        return None
+
+    try:
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None  # unreadable or empty
+    try:
+        if mapped[:len(MAGIC)] != MAGIC:
+            raise ValueError("not a resolver snapshot")
+        (size,) = struct.unpack_from("<I", mapped, len(MAGIC))
+        header = json.loads(mapped[len(MAGIC) + 4:len(MAGIC) + 4 + size])
+        truncated = any(offset + count * struct.calcsize(fmt) > len(mapped)
+                        for fmt, offset, count in header["sections"].values())
+    except (KeyError, ValueError, struct.error):
+        mapped.close()
+        return None
+    if (truncated or header.get("version") != SNAPSHOT_VERSION or header.get("params") != _params()
+            or header.get("generation") != current):
+        mapped.close()
+        return None
+
+    # The views keep the mapping open for as long as the index is in use.
+    view = memoryview(mapped)
+    arrays = {}
+    for key, (fmt, offset, count) in header["sections"].items():
+        itemsize = struct.calcsize(fmt)
+        arrays[key] = view[offset:offset + count * itemsize].cast(fmt)
+
+    def section(prefix):
+        return {key[len(prefix):]: value for key, value in arrays.items() if key.startswith(prefix)}
+
+    names = NameTable.from_arrays(arrays["names"], arrays["name_offsets"])
+    return ResolverSnapshot(current, names, arrays["starts"], arrays["nodes"],
+                            TrigramIndex(names, section("trigram.")), EditIndex(names, section("edit.")))